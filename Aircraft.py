@@ -5,14 +5,23 @@ from parapy.geom import *
 from Wing import Semiwing
 from Battery import Battery
 from Engine import Engine
+from MotorSelection import load_motor_data, NAME
+from FixedPoint import solve_fixed_point
+from Mission import mission_profile, simulate_mission
+from Profiling import PROFILER
+from Plotting import submit_plot, render_prop_curve, render_motor_curve, render_velocity_sweep
+from ResultsStore import ResultsStore, RESULTS_FILE
+from StepExport import StepCache, component_key, position_key, merge_step_files
+from Compatibility import load_compatibility
 from Payload import Payload
-from __init__ import generate_warning
+from __init__ import generate_warning, get_lod, mesh_deflection
 from Fuselage import Fuselage
 from math import *
 
+import os
+import shutil
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 
 class Aircraft(GeomBase):
@@ -112,10 +121,73 @@ class Aircraft(GeomBase):
     #:
     vt_taper: float = Input(0.4)
 
+    # number of velocities evaluated in the velocity sweep
+    sweep_points = Input(11)
+
+    # objective of the motor selection, 'mass' for the lightest feasible motor or 'margin' for the largest reserve
+    motor_objective = Input('mass')
+
+    # take the drag of the main wing from a surrogate drag polar instead of running Q3D for every condition. The tails
+    # fly at a fixed cL, so one Q3D run per iteration is cheaper than fitting a polar for them.
+    drag_surrogate = Input(False)
+
+    # compute wetted areas analytically instead of from the CAD geometry, which is then only built for display and
+    # export
+    analysis_mode = Input(True)
+
+    # level of detail of the tessellation for display, 'coarse', 'fine' or 'auto' (see __init__.py)
+    @Input
+    def lod(self):
+        return get_lod()
+
+    # mesh deflection of all displayed shapes, based on the level of detail and the size of the whole aircraft
+    @Input
+    def mesh_deflection(self):
+        return mesh_deflection(self.model_size, self.lod)
+
+    # folder for all output files
+    output_dir = Input('Outputs')
+
+    # stopping criteria of iterate, relative change of wing area and cL, maximum number of passes through the model
+    # (over all outer iterations) and maximum number of outer iterations updating motors and cells
+    convergence_tolerance = Input(1e-3)
+    max_iterations = Input(50)
+    max_outer_iterations = Input(10)
+
+    # mass, capacity, wing area, cL, motors and relative residuals of every iteration of the last call of iterate
+    convergence_history = Input([])
+    # whether the last call of iterate converged within its budget
+    converged = Input(False)
+
+    # handles of the plots rendered in the background by the plotting actions (see Plotting.py), by file name. Poll
+    # them with done(), or wait for them with result().
+    plot_handles = Input({})
+
+    # mission simulated by the mission attribute (see Mission.py): catapult launch and climb at launch_velocity (by
+    # default 1.3 times the stall speed), cruise at the design velocity over the endurance requirement, loiter and the
+    # approach into the catch arm
+    @Input
+    def launch_velocity(self):
+        return 1.3 * self.stall_speed               # in km/h
+    launch_time = Input(5)                          # in s
+    launch_climb_rate = Input(5)                    # in m/s
+    climb_altitude = Input(100)                     # in m
+    climb_rate = Input(2.5)                         # in m/s
+    loiter_time = Input(0)                          # in h
+    approach_time = Input(60)                       # in s
+    approach_rate = Input(-1.5)                     # in m/s
+    mission_reserve = Input(0.2)                    # state of charge left at the end of the mission
+    mission_time_step = Input(1)                    # in s
+
     # battery parameters (initial value, to be changed during iteration)
     battery_capacity = Input(1)
     battery_cells = Input(3)
 
+    # path of an output file in the output folder, the folder is created if needed
+    def output_path(self, filename):
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, filename)
+
     # endurance requirement translated to flight time
     @Attribute
     def time_requirement(self):
@@ -218,6 +290,27 @@ class Aircraft(GeomBase):
     def endurance_range(self):
         return self.velocity * self.endurance_time
 
+    # phases of the simulated mission
+    @Attribute
+    def mission_phases(self):
+        return mission_profile(self.launch_velocity, self.velocity, self.time_requirement * 3600,
+                               launch_time=self.launch_time, launch_climb_rate=self.launch_climb_rate,
+                               climb_altitude=self.climb_altitude, climb_rate=self.climb_rate,
+                               loiter_time=self.loiter_time * 3600, approach_time=self.approach_time,
+                               approach_rate=self.approach_rate)
+
+    # Time-stepped simulation of the mission with voltage sag and Peukert losses of the battery (see Mission.py), based
+    # on the drag of the velocity sweep, the propeller map and the motor of the engines
+    @Attribute
+    def mission(self):
+        data = self.velocity_sweep_data
+        motor = self.engines[0].motor
+        result = simulate_mission(self.mission_phases, data['velocities'], data['drags'], self.total_weight,
+                                  self.engines[0].propeller.prop_map, self.num_engines, motor.k_phi,
+                                  motor.resistance, motor.max_current, self.battery.pack, dt=self.mission_time_step,
+                                  reserve=self.mission_reserve, record=True)
+        return {key: value[0] for key, value in result.items()}
+
     # Compute number of battery cells to give the minimum maximum rated voltage for all motors
     @Attribute
     def battery_cells_required(self):
@@ -226,19 +319,34 @@ class Aircraft(GeomBase):
             cells = np.nanmin([cells, self.engines[i].motor.battery_cells_required])
         return cells.astype(int)
 
-    # Load input database of available motors
+    # Compiled catalog of available motors, shared memory-mapped by all instances (see MotorSelection.py)
     @Attribute
     def motor_data(self):
-        data = pd.read_excel('Inputs/Motor_data.xlsx')
-        data = np.array(data)
-        data = data[data[:, 1].argsort()]
-        return data
+        return load_motor_data()
+
+    # Motors of the catalog able to drive the propeller at the design point, taken from the precomputed motor x
+    # propeller compatibility matrix
+    @Attribute
+    def compatible_motors(self):
+        compatibility = load_compatibility()
+        idx = compatibility.compatible_motors(self.propeller, self.velocity, self.drag / self.num_engines)
+        return [compatibility.motor_names[i] for i in idx]
+
+    # size of the model in view for the automatic level of detail
+    @Attribute
+    def model_size(self):
+        return max(self.fuselage.fuselage_length, 2 * self.w_semi_span)
 
     # Drag calculation at design point
     @Attribute
     def drag(self):
         print("Calculate drag")
         drag = 0
+
+        # submit the Q3D runs of all lifting surfaces first, so the engine pool evaluates them concurrently
+        for surface in (self.right_wing, self.tail_right_wing, self.vertical_tail):
+            if not surface.drag_surrogate:
+                surface.q3d_future
         velocity = self.velocity        # in km/h
 
         # wing drag
@@ -258,26 +366,27 @@ class Aircraft(GeomBase):
 
         return drag
 
-    # function to calculate the drag at different velocities
+    # function to calculate the drag at different velocities, the wing polar points are evaluated in one Q3D batch
     def variable_drag(self, velocities):
-        drags = np.zeros_like(velocities)
+        velocities = np.asarray(velocities, dtype=float)
+        for surface in (self.tail_right_wing, self.vertical_tail):
+            if not surface.drag_surrogate:
+                surface.q3d_future
+        dynamic_pressure = self.air_density/2 * (velocities/3.6)**2
 
-        for i, velocity in enumerate(velocities):
-            # wing drag
-            cL = self.total_weight/(self.wing_surface_area*0.5*self.air_density*(velocity/3.6)**2)
-            cD = self.right_wing.variable_wing_cd(velocity, cL)
-            drags[i] += self.air_density/2 * (velocity/3.6)**2 * self.wing_surface_area * cD
+        # wing drag
+        cL = self.total_weight/(self.wing_surface_area*dynamic_pressure)
+        cD = self.right_wing.batch_wing_cd(velocities, cL)
+        drags = dynamic_pressure * self.wing_surface_area * cD
 
-            # horizontal tail
-            cD_htail = self.tail_right_wing.wing_cd
-            drags[i] += self.air_density / 2 * (velocity / 3.6) ** 2 * self.horizontal_tail_surface_area * cD_htail
+        # horizontal tail
+        drags += dynamic_pressure * self.horizontal_tail_surface_area * self.tail_right_wing.wing_cd
 
-            # horizontal tail
-            cD_vtail = self.vertical_tail.wing_cd
-            drags[i] += self.air_density / 2 * (velocity / 3.6) ** 2 * self.vertical_tail_surface_area * cD_vtail
+        # vertical tail
+        drags += dynamic_pressure * self.vertical_tail_surface_area * self.vertical_tail.wing_cd
 
-            # fuselage
-            drags[i] += self.zero_lift_drag
+        # fuselage
+        drags += self.zero_lift_drag
 
         return drags
 
@@ -322,7 +431,8 @@ class Aircraft(GeomBase):
     def fuselage(self):
         return Fuselage(position= translate
                                         (self.position, "x",
-                                         self.fuselage.payload_section_length/2,))
+                                         self.fuselage.payload_section_length/2,),
+                        mesh_deflection=self.mesh_deflection)
 
 
     @Part
@@ -360,7 +470,8 @@ class Aircraft(GeomBase):
                       pos_y=self.motor_y_positions[child.index],
                       pos_z=0 if child.index != (self.num_engines-1)/2
                               else self.fuselage.profile_set[0].location.z,
-                      iteration_history=np.zeros((3,)))
+                      motor_objective=self.motor_objective,
+                      visited_motors=[])
 
     @Part
     def payload(self):
@@ -393,6 +504,9 @@ class Aircraft(GeomBase):
                         cl=self.cl_required,
 
                         visc_option=1,
+                        drag_surrogate=self.drag_surrogate,
+                        surrogate_cl_range=(0.0, 1.2*self.max_cl),    # stall cL inside of the polar
+                        mesh_deflection=self.mesh_deflection,
 
                         #position=rotate(
                         #                "x",
@@ -407,7 +521,7 @@ class Aircraft(GeomBase):
                              # Two vectors to define the mirror plane
                              vector1=self.position.Vz,
                              vector2=self.position.Vx,
-                             mesh_deflection=0.0001)
+                             mesh_deflection=self.mesh_deflection)
 
     @Attribute
     def tail_arm(self):
@@ -440,6 +554,8 @@ class Aircraft(GeomBase):
                         cl=self.tail_cl,
 
                         visc_option=1,
+                        drag_surrogate=False,
+                        mesh_deflection=self.mesh_deflection,
 
                         position=rotate(translate
                                         (self.position, "x",
@@ -456,7 +572,7 @@ class Aircraft(GeomBase):
                              # Two vectors to define the mirror plane
                              vector1=self.position.Vz,
                              vector2=self.position.Vx,
-                             mesh_deflection=0.0001)
+                             mesh_deflection=self.mesh_deflection)
 
     @Part
     def vertical_tail(self):
@@ -478,6 +594,8 @@ class Aircraft(GeomBase):
                         cl=self.tail_cl,
 
                         visc_option=1,
+                        drag_surrogate=False,
+                        mesh_deflection=self.mesh_deflection,
 
                         position=rotate(translate
                                         (self.position,
@@ -490,12 +608,72 @@ class Aircraft(GeomBase):
     # STEP Writer object to export STEP file
     @Part
     def step_writer(self):
-        return STEPWriter(trees=[self], filename="Outputs/step_export.stp")
+        return STEPWriter(trees=[self], filename=self.output_path("step_export.stp"))
+
+    # Components of the STEP export as (name, node, values defining its geometry). The values are computed without
+    # building any geometry and are the key of the component in the STEP cache.
+    @Attribute
+    def step_components(self):
+        components = [('fuselage', self.fuselage.fuselage_lofted_surf, self.fuselage.geometry_key),
+                      ('payload_door', self.payload_door,
+                       self.fuselage.geometry_key + [position_key(self.position)]),
+                      ('right_wing', self.right_wing, self.right_wing.geometry_key),
+                      ('left_wing', self.left_wing, self.right_wing.geometry_key + [position_key(self.position)]),
+                      ('tail_right_wing', self.tail_right_wing, self.tail_right_wing.geometry_key),
+                      ('tail_left_wing', self.tail_left_wing,
+                       self.tail_right_wing.geometry_key + [position_key(self.position)]),
+                      ('vertical_tail', self.vertical_tail, self.vertical_tail.geometry_key),
+                      ('battery', self.battery.body, self.battery.geometry_key),
+                      ('payload', self.payload.body, self.payload.geometry_key)]
+        for i in range(self.num_engines):
+            components.append(('motor_{}'.format(i), self.engines[i].motor.body,
+                               self.engines[i].motor.geometry_key))
+            components.append(('propeller_{}'.format(i), self.engines[i].propeller.body,
+                               self.engines[i].propeller.geometry_key))
+        return components
+
+    # Export every component to its own STEP file in the folder step_components and the whole aircraft to
+    # step_export.stp. Components are taken from the STEP cache if their geometry did not change, only the changed ones
+    # are written (see StepExport.py). The assembly is merged from the component files and skipped if no component
+    # changed.
+    @action
+    def export_step(self):
+        paths = StepCache(self.output_path('step_cache')).export(self.step_components)
+        component_dir = self.output_path('step_components')
+        os.makedirs(component_dir, exist_ok=True)
+        for name, path in paths.items():
+            shutil.copyfile(path, os.path.join(component_dir, name + '.stp'))
+
+        assembly_key = component_key('assembly', sorted(os.path.basename(path) for path in paths.values()))
+        key_path = self.output_path('step_export.key')
+        if os.path.exists(self.output_path('step_export.stp')) and os.path.exists(key_path):
+            with open(key_path) as f:
+                if f.read() == assembly_key:
+                    print("STEP assembly unchanged")
+                    return
+        merge_step_files(list(paths.values()), self.output_path('step_export.stp'))
+        with open(key_path, 'w') as f:
+            f.write(assembly_key)
+
+    # switch the display between coarse and fine tessellation, e.g. fine for a final screenshot and back to coarse for
+    # browsing the model
+    @action
+    def toggle_lod(self):
+        self.lod = 'coarse' if self.lod == 'fine' else 'fine'
+        print("Level of detail:", self.lod)
+
+    # Wetted area of fuselage, wings and tails. In analysis mode it is computed from the parameters of the parts, so
+    # the sizing loop does not build any geometry, otherwise it is taken from the OCC surfaces.
+    @Attribute
+    def wetted_area(self):
+        if self.analysis_mode:
+            return self.fuselage.wetted_area+self.right_wing.wetted_area*2+self.tail_right_wing.wetted_area*2+self.vertical_tail.wetted_area
+        return self.fuselage.fuselage_lofted_surf.area+self.right_wing.area*2+self.tail_right_wing.area*2+self.vertical_tail.area
 
     # Drag of the fuselage
     @Attribute
     def zero_lift_drag(self):
-        return self.skin_friction_coefficient * (self.fuselage.fuselage_lofted_surf.area+self.right_wing.area*2+self.tail_right_wing.area*2+self.vertical_tail.area)/self.wing_surface_area
+        return self.skin_friction_coefficient * self.wetted_area/self.wing_surface_area
 
     # Iterate the parameters of the aircraft to generate a converged solution. The following values are explicitly
     # iterated:
@@ -505,22 +683,57 @@ class Aircraft(GeomBase):
     # - batteries capacity based on required endurance
     # - batteries voltage (number of cells in series) based on maximum rated voltage of motors
     #
+    # The continuous values (wing area, cL and capacity) are converged together for the current motors and cells with
+    # an accelerated fixed point iteration (see FixedPoint.py), setting all of them at once per iteration. The discrete
+    # values (motors and cells in series) are updated in an outer loop until they do not change anymore. All passes
+    # through the model share the budget max_iterations. The values, relative residuals and outer iteration of every
+    # pass are stored in convergence_history, and whether the iteration converged in converged.
+    #
     # If the iteration result if not valid (in this case only considering the power train), a warning is raised.
     @action
     def iterate(self):
-        any_changes = True
-
-        while any_changes:
-            print("=================================")
-            print("Total mass", self.total_weight / 9.80665, " kg")
-            print("Capacity", self.battery.capacity, " Ah")
-            any_changes = False
-
-            # change the required cL of the wing to match current conditions
-            self.cl_required = self.total_weight/(self.wing_surface_area*0.5*self.air_density*(self.velocity/3.6)**2)
-
-            # calculate, if the surface area of the wing has to be changed
-            self.wing_surface_area = self.total_weight/(0.5*self.max_cl*self.air_density*(self.stall_speed/3.6)**2)
+        history = []
+
+        # new wing area, cL and capacity for the current ones, with profiling on every pass is traced separately
+        def update(x):
+            with PROFILER.trace('iterate_pass_{:03d}'.format(len(history) + 1)):
+                self.wing_surface_area, self.cl_required, self.battery_capacity = (float(value) for value in x)
+                print("=================================")
+                print("Total mass", self.total_weight / 9.80665, " kg")
+                print("Capacity", self.battery.capacity, " Ah")
+                history.append(dict(total_mass=float(self.total_weight / 9.80665),
+                                    battery_capacity=float(self.battery.capacity),
+                                    wing_surface_area=self.wing_surface_area,
+                                    cl_required=self.cl_required,
+                                    motor_idx=[int(self.engines[i].motor.motor_idx) for i in range(self.num_engines)]))
+
+                # wing area based on stall speed and cL required at the design velocity for that area
+                wing_surface_area = self.total_weight/(0.5*self.max_cl*self.air_density*(self.stall_speed/3.6)**2)
+                cl_required = self.total_weight/(wing_surface_area*0.5*self.air_density*(self.velocity/3.6)**2)
+                # capacity needed for the required endurance, the battery rounds it up to whole cells
+                battery_capacity = self.time_requirement * self.total_current
+            return [wing_surface_area, cl_required, battery_capacity]
+
+        # the capacity has converged if the battery gets the same number of parallel cells
+        def converged(x, g):
+            continuous = np.all(np.abs(g[:2] - x[:2]) <= self.convergence_tolerance * np.abs(g[:2]))
+            cells = np.ceil(x[2] / self.battery.capacity_per_cell) == np.ceil(g[2] / self.battery.capacity_per_cell)
+            return continuous and cells
+
+        converged_all = False
+        outer = -1
+        for outer in range(self.max_outer_iterations):
+            if len(history) >= self.max_iterations:
+                break
+            x, g, residuals, inner_converged = solve_fixed_point(
+                update, [self.wing_surface_area, self.cl_required, self.battery_capacity],
+                max_iterations=self.max_iterations - len(history), converged=converged)
+            for entry, residual in zip(history[-len(residuals):], residuals):
+                entry['residuals'] = dict(zip(('wing_surface_area', 'cl_required', 'battery_capacity'),
+                                              residual.tolist()))
+                entry['outer_iteration'] = outer
+            print("Residuals", residuals[-1], "after", len(residuals), "iterations")
+            any_changes = not inner_converged
 
             # adjust motor selection
             for i in range(self.num_engines):
@@ -529,21 +742,22 @@ class Aircraft(GeomBase):
                     print("Change motor")
                 any_changes = any_changes or change
 
-            # calculate, if the capacity of the battery has to be changed
-            factor_cap = self.endurance / self.endurance_time if self.endurance_mode == 'T' \
-                else self.endurance / self.endurance_range
-            num_add_cells = np.ceil(self.battery.capacity * (factor_cap - 1) / self.battery.capacity_per_cell)
-            if num_add_cells != 0:
-                print("Change capacity")
-                any_changes = True
-                self.battery_capacity += num_add_cells * self.battery.capacity_per_cell
-
             # calculate, if the voltage of the battery has to be increased
             if self.battery_cells != self.battery_cells_required:
                 print("Change voltage")
                 any_changes = True
                 self.battery_cells = self.battery_cells_required
 
+            if not any_changes:
+                converged_all = True
+                break
+
+        self.convergence_history = history
+        self.converged = converged_all
+        if not converged_all:
+            msg = "The iteration did not converge within {} passes ({} allowed) and {} outer iterations ({} " \
+                  "allowed).".format(len(history), self.max_iterations, outer + 1, self.max_outer_iterations)
+            generate_warning("Iteration not converged", msg)
         if not self.is_valid:
             msg = "The iteration result found is not valid."
             generate_warning("Iteration result invalid", msg)
@@ -553,15 +767,7 @@ class Aircraft(GeomBase):
     def create_prop_curve(self):
         characteristics, _ = self.engines[0].propeller.prop_characteristics
         v, t = characteristics[:, 0, :], self.num_engines * characteristics[:, 7, :]
-
-        plt.plot(v, t, 'b')
-        plt.plot(self.velocity, self.drag, 'r*')
-        plt.plot([0, self.velocity, self.velocity], [self.drag, self.drag, 0], 'k:')
-        plt.xlabel("Velocity (km/h)")
-        plt.ylabel("Thrust (N)")
-        plt.title("Thrust over velocity of the drone")
-        plt.savefig('Outputs/prop_curves.pdf')
-        plt.close()
+        return self._submit_plot('prop_curves.pdf', render_prop_curve, v, t, self.velocity, self.drag)
 
     # Export figure showing the motor characteristics (motor speed over applied torque for maximal voltage)
     # and propeller requirements (torque for different propeller speeds and velocities)
@@ -569,7 +775,6 @@ class Aircraft(GeomBase):
     def create_motor_curve(self):
         characteristics, rpm = self.engines[0].propeller.prop_characteristics
         v, q = characteristics[:, 0, :], characteristics[:, 6, :]
-        rpm_matrix = np.ones((characteristics.shape[0], 1)) * rpm
 
         k_phi = self.engines[0].motor.k_phi
         resistance = self.engines[0].motor.resistance
@@ -577,46 +782,67 @@ class Aircraft(GeomBase):
 
         motor_speed = np.array([0, max_voltage / k_phi])
         torque = (max_voltage / k_phi - motor_speed) / (resistance * 2 * np.pi / k_phi ** 2)
+        return self._submit_plot('motor_curves.pdf', render_motor_curve, torque, motor_speed, q, rpm, v,
+                                 self.engines[0].propeller.torque_op, self.engines[0].propeller.rpm_op)
 
-        plt.plot(torque, motor_speed)
-        sc = plt.scatter(q, rpm_matrix / 60, s=2, c=v)
-        plt.plot(self.engines[0].propeller.torque_op, self.engines[0].propeller.rpm_op / 60, "r*")
-        plt.plot([0, self.engines[0].propeller.torque_op, self.engines[0].propeller.torque_op],
-                 [self.engines[0].propeller.rpm_op / 60, self.engines[0].propeller.rpm_op / 60, 0], 'k:')
-        plt.colorbar(sc, label="Velocity (km/h)")
-        plt.xlabel("Motor Torque (Nm)")
-        plt.ylabel("Motor Speed, Propeller Speed (1/s)")
-        plt.title("Motor Characteristics for max. Voltage\n and Propeller Torque Requirement")
-        plt.savefig('Outputs/motor_curves.pdf')
-        plt.close()
+    # Performance at varying velocities between stall speed and 1.5 times the design velocity. Evaluated on the main
+    # thread by velocity_sweep, the Q3D points of the wing are run on all engines of the Q3D pool (see
+    # Wing.batch_run_q3d).
+    @Attribute
+    def velocity_sweep_data(self):
+        velocities = np.linspace(self.stall_speed, 1.5*self.velocity, self.sweep_points)
+        drags = self.variable_drag(velocities)
+        motor_speed, torque, thrust, voltage, current, op_valid = self.engines[0].variable_velocity(velocities, drags/self.num_engines)
+        return dict(velocities=velocities, motor_speed=motor_speed, drags=drags, current=current,
+                    efficiency=drags/self.total_weight)
 
     # Export figures showing the performance at varying velocities.
     @action
     def velocity_sweep(self):
-        velocities = np.linspace(self.stall_speed, 1.5*self.velocity, 11)
-        drags = self.variable_drag(velocities)
-        motor_speed, torque, thrust, voltage, current, op_valid = self.engines[0].variable_velocity(velocities, drags/self.num_engines)
-
-        fig, (ax1, ax2, ax3, ax4) = plt.subplots(4, 1, sharex=True, sharey=False)
-        ax1.plot(velocities, motor_speed)
-        ax1.set_ylabel("Motor Speed (1/s)")
-        ax1.set_title("")
-
-        ax2.plot(velocities, drags)
-        ax2.set_ylabel("Drag (N)")
-        ax2.set_title("")
-
-        ax3.plot(velocities, current)
-        ax3.set_ylabel("Current (A)")
-        ax3.set_title("")
-
-        ax4.plot(velocities, drags/self.total_weight)
-        ax4.set_ylabel("Aerodynamic Efficiency (-)")
-        ax4.set_title("")
+        data = self.velocity_sweep_data
+        return self._submit_plot('velocity_sweep.pdf', render_velocity_sweep, data['velocities'],
+                                 data['motor_speed'], data['drags'], data['current'], data['efficiency'])
+
+    # render a plot from a snapshot of the data in the background, returns the handle
+    def _submit_plot(self, file_name, render, *data):
+        data = [np.array(value, dtype=float) for value in data]     # copies, independent of the model
+        handle = submit_plot(render, self.output_path(file_name), *data)
+        self.plot_handles = dict(self.plot_handles, **{file_name: handle})
+        return handle
+
+    # Main outputs of the sized aircraft
+    @Attribute
+    def results(self):
+        return dict(total_mass=float(self.total_weight / 9.80665),
+                    battery_capacity=float(self.battery.capacity),
+                    battery_cells=int(self.battery.cells),
+                    wing_surface_area=float(self.wing_surface_area),
+                    motor=str(self.motor_data[NAME][self.engines[0].motor.motor_idx]),
+                    endurance_margin=float(self.endurance_time / self.time_requirement - 1),
+                    lift_to_drag=float(self.total_weight / self.drag),
+                    iterations=len(self.convergence_history))
+
+    # 'not_converged' if the last iteration did not converge, otherwise 'converged' or 'invalid' depending on whether
+    # the result is valid
+    @Attribute
+    def status(self):
+        if not self.converged:
+            return 'not_converged'
+        return 'converged' if self.is_valid else 'invalid'
 
-        plt.xlabel("Velocity (km/h)")
-        plt.savefig('Outputs/velocity_sweep.pdf')
-        plt.close(fig)
+    # Append inputs, outputs and iteration history of the design to the results database in the output folder
+    @action
+    def save_results(self):
+        inputs = dict(endurance=self.endurance, endurance_mode=self.endurance_mode, velocity=self.velocity,
+                      propeller=self.propeller, num_engines=self.num_engines,
+                      structural_material=self.structural_material, airfoil_root=self.airfoil_root,
+                      airfoil_tip=self.airfoil_tip, w_semi_span=self.w_semi_span, payload_width=self.payload_width,
+                      payload_length=self.payload_length, payload_height=self.payload_height,
+                      payload_weight=self.payload_weight)
+        record = dict(self.results, name=self.label, inputs=inputs, status=self.status)
+        store = ResultsStore(self.output_path(RESULTS_FILE))
+        store.append(record, self.convergence_history)
+        store.close()
 
     # Export some main parameters of the aircraft for future usage as input file.
     @action
@@ -631,45 +857,51 @@ class Aircraft(GeomBase):
                            self.horizontal_tail_airfoil_root, self.vertical_tail_airfoil_root, self.payload_width,
                            self.payload_length,
                            self.payload_height, self.payload_weight, self.battery.capacity,
-                           self.battery.cells, self.motor_data[self.engines[0].motor.motor_idx, 0],
+                           self.battery.cells, self.motor_data[NAME][self.engines[0].motor.motor_idx],
                            self.total_weight / self.drag])
         units = np.array(['h' if values[1] == 'T' else 'km', np.nan, 'km/h', np.nan, np.nan, np.nan, np.nan, np.nan,
                           np.nan, np.nan, 'm', 'm', 'm', 'N', 'Ah', np.nan, np.nan, np.nan])
 
 
         df = pd.DataFrame(np.vstack((values, units)).T, index=index, columns=columns)
-        df.to_excel('Outputs/parameters.xlsx')
+        df.to_excel(self.output_path('parameters.xlsx'))
 
 
-if __name__ == '__main__':
-    data = pd.read_excel('Inputs/Input_data.xlsx')
+# Read the inputs of a design from an input file in the format of Inputs/Input_data.xlsx
+def read_input_file(file_path):
+    data = pd.read_excel(file_path)
     data = np.array(data)
 
-    obj = Aircraft(endurance=data[0, 1],
-                   endurance_mode=data[1, 1],
-                   velocity=data[2, 1],
-                   propeller=data[3, 1],
-                   num_engines=data[4, 1],
-                   structural_material=data[5, 1],
-                   airfoil_root=data[6, 1],
-                   airfoil_tip=data[7, 1],
-                   horizontal_tail_airfoil_root=data[8, 1],
-                   horizontal_tail_airfoil_tip=data[8, 1],
-                   vertical_tail_airfoil_root=data[9, 1],
-                   vertical_tail_airfoil_tip=data[9, 1],
-                   #payload_width=data[10, 1],      # when uncommented, Q3D calculation sometimes crashes for the tail
-                   #payload_length=data[11, 1],     # Reason unknown so far. But apparently the values from the input
-                   #payload_height=data[12, 1],     # file make issues
-                   #payload_weight=data[13, 1]
-                )
+    inputs = dict(endurance=data[0, 1],
+                  endurance_mode=data[1, 1],
+                  velocity=data[2, 1],
+                  propeller=data[3, 1],
+                  num_engines=data[4, 1],
+                  structural_material=data[5, 1],
+                  airfoil_root=data[6, 1],
+                  airfoil_tip=data[7, 1],
+                  horizontal_tail_airfoil_root=data[8, 1],
+                  horizontal_tail_airfoil_tip=data[8, 1],
+                  vertical_tail_airfoil_root=data[9, 1],
+                  vertical_tail_airfoil_tip=data[9, 1],
+                  #payload_width=data[10, 1],      # when uncommented, Q3D calculation sometimes crashes for the tail
+                  #payload_length=data[11, 1],     # Reason unknown so far. But apparently the values from the input
+                  #payload_height=data[12, 1],     # file make issues
+                  #payload_weight=data[13, 1]
+                  )
 
     # optional inputs
     for i in range(14, data.shape[0]):
         if not np.isnan(data[i, 1]):
             if data[i, 0] == 'Battery Capacity':
-                obj.battery_capacity = data[i, 1]
+                inputs['battery_capacity'] = data[i, 1]
             elif data[i, 0] == 'Battery Cells':
-                obj.battery_cells = data[i, 1]
+                inputs['battery_cells'] = data[i, 1]
+    return inputs
+
+
+if __name__ == '__main__':
+    obj = Aircraft(**read_input_file('Inputs/Input_data.xlsx'))
 
     from parapy.gui import display
 
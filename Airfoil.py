@@ -1,8 +1,9 @@
 from kbeutils.geom.curve import Naca5AirfoilCurve, Naca4AirfoilCurve
 from parapy.geom import *
 from parapy.core import *
-import os.path
 import numpy as np
+from AirfoilData import load_airfoil
+from __init__ import mesh_deflection
 
 
 
@@ -10,42 +11,46 @@ class Airfoil(FittedCurve):  # note the use of FittedCurve as superclass
     airfoil_name = Input('whitcomb')                  # input from the airfoil folder
     chord = Input(1)                                  # chord in [m]
     thickness_factor = Input(0.1)                     # thickness factor for the airfoil
-    mesh_deflection = Input(0.0000001)
     tolerance = 0.0001
 
 
 
+    @Input          # tessellation of the displayed airfoil, by default based on its chord (see __init__.py)
+    def mesh_deflection(self):
+        return mesh_deflection(self.chord)
+
+    @Attribute
+    def coordinates(self):  # unscaled coordinates of the airfoil file, shared with all parts using the same airfoil
+        return load_airfoil(self.airfoil_name)
+
     @Attribute
     def points(self):  # required input to the FittedCurve superclass
-        if self.airfoil_name.endswith('.dat'):  # check whether the airfoil name string includes .dat already
-            airfoil_file = self.airfoil_name
-        else:
-            airfoil_file = self.airfoil_name + '.dat'
-        file_path = os.path.join('Airfoil_data', airfoil_file)
-        with open(file_path, 'r') as f:
-            point_lst = []
-            for line in f:
-                x, z = line.split(' ', 1)  # the cartesian coordinates are directly interpreted as X and Z coordinates
-                point_lst.append(self.position.translate(
-                    "x", -float(x) * self.chord,  # the x points are scaled according to the airfoil chord length
-                    "z", float(z) * self.chord * self.thickness_factor))  # the y points are scaled according to the /
-                # thickness factor
-        return point_lst
+        # the cartesian coordinates are directly interpreted as X and Z coordinates, scaled according to the chord
+        # length and the thickness factor and placed along the x and z axes of the position in one array transform
+        scale = np.array([-self.chord, self.chord * self.thickness_factor])
+        axes = np.array([[self.position.Vx.x, self.position.Vx.y, self.position.Vx.z],
+                         [self.position.Vz.x, self.position.Vz.y, self.position.Vz.z]])
+        location = self.position.location
+        origin = np.array([location.x, location.y, location.z])
+        xyz = origin + (self.coordinates * scale) @ axes
+        return [Point(x, y, z) for x, y, z in xyz.tolist()]
+
+    @Attribute
+    def yt_xl_xu(self):  # coordinates in reversed order as required for the CST input (read-only view)
+        return self.coordinates[::-1]
+
+    @Attribute
+    def section_coordinates(self):  # x and z coordinates of the scaled airfoil, without building the curve
+        return self.yt_xl_xu * [self.chord, self.chord * self.thickness_factor]
+
+    @Attribute
+    def perimeter(self):  # length of the airfoil contour
+        return float(np.sum(np.linalg.norm(np.diff(self.section_coordinates, axis=0), axis=1)))
 
     @Attribute
-    def yt_xl_xu(self):
-        if self.airfoil_name.endswith('.dat'):  # check whether the airfoil name string includes .dat already
-            airfoil_file = self.airfoil_name
-        else:
-            airfoil_file = self.airfoil_name + '.dat'
-        file_path = os.path.join('Airfoil_data', airfoil_file)
-        with open(file_path, 'r') as f:
-            point_lst = []
-            for line in f:
-                x, y = line.split(' ', 1)  # the cartesian coordinates are directly interpreted as X and Z coordinates. Order of the points needs to be reversed for the CST input
-                point_lst.append([float(x), float(y)])
-        point_lst.reverse()
-        return point_lst
+    def section_area(self):  # area enclosed by the airfoil contour (shoelace formula)
+        x, z = self.section_coordinates[:, 0], self.section_coordinates[:, 1]
+        return float(0.5 * abs(np.dot(x, np.roll(z, -1)) - np.dot(z, np.roll(x, -1))))
 
 if __name__ == '__main__':
     from parapy.gui import display
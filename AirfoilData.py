@@ -0,0 +1,33 @@
+import os.path
+import numpy as np
+
+# Loader of the airfoil coordinate files of the Airfoil_data folder (x and z per line, from the trailing edge over the
+# upper surface to the leading edge and back over the lower surface). Every file is parsed once; all Airfoil parts
+# using it share the same read-only array until the file changes.
+
+AIRFOIL_DATA_DIR = 'Airfoil_data'
+
+# in-memory coordinates, keyed by file path and holding (mtime, coordinates)
+_loaded = {}
+
+
+# file path of an airfoil name, with or without .dat
+def airfoil_file(airfoil_name):
+    if not airfoil_name.endswith('.dat'):
+        airfoil_name += '.dat'
+    return os.path.join(AIRFOIL_DATA_DIR, airfoil_name)
+
+
+# coordinates of an airfoil as read-only (n, 2) array
+def load_airfoil(airfoil_name):
+    file_path = airfoil_file(airfoil_name)
+    mtime = os.stat(file_path).st_mtime_ns
+
+    loaded = _loaded.get(file_path)
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+
+    coordinates = np.loadtxt(file_path, dtype=float, ndmin=2)[:, :2]
+    coordinates.setflags(write=False)
+    _loaded[file_path] = (mtime, coordinates)
+    return coordinates
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import os.path
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from ResultsStore import ResultsStore, RESULTS_FILE
+
+# Headless batch runner. Every row of a design table (.csv or .xlsx, one column per Aircraft input, e.g. endurance,
+# endurance_mode, velocity, propeller, num_engines, ...) is sized with Aircraft.iterate in a pool of worker processes,
+# without GUI and without message boxes. Each design writes its outputs to its own folder and the results, including
+# all warnings, are collected in summary.json of the batch output folder. Inputs, outputs and iteration histories of all
+# designs are also appended to the results database results.sqlite of the output folder (see ResultsStore.py).
+#
+#   python Batch.py designs.csv --workers 4 --output Outputs/batch --plots --step
+
+# designs of a table as (name, inputs), empty cells are left at the defaults of Aircraft. Names are used for the
+# output folders, so a name that is already taken gets the row index appended.
+def read_design_specs(file_path):
+    if file_path.endswith('.csv'):
+        table = pd.read_csv(file_path)
+    else:
+        table = pd.read_excel(file_path)
+
+    designs = []
+    names = set()
+    for i, row in table.iterrows():
+        inputs = {key: value.item() if isinstance(value, np.generic) else value
+                  for key, value in row.items() if not pd.isna(value)}
+        name = re.sub(r'[^\w.-]', '_', str(inputs.pop('name', 'design_{:04d}'.format(i))))
+        while name in names:
+            name = '{}_{}'.format(name, i)
+        names.add(name)
+        designs.append((name, inputs))
+    return designs
+
+
+def _init_worker():
+    os.environ['KBE_HEADLESS'] = '1'
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+
+# size a single design, runs in a worker process. If results_file is given, the design is appended to that results
+# database.
+def run_design(name, inputs, output_dir, outputs=('parameters',), results_file=None):
+    import __init__
+    __init__.set_headless(True)
+    del __init__.WARNINGS[:]
+    from Aircraft import Aircraft
+    from Profiling import PROFILER
+
+    start = time.time()
+    record = {'name': name, 'inputs': inputs, 'output_dir': output_dir}
+    history = []
+    try:
+        if 'profile' in outputs:
+            PROFILER.enable(os.path.join(output_dir, 'profile'))
+        obj = Aircraft(output_dir=output_dir, **inputs)
+        obj.iterate()
+        record.update(obj.results, status=obj.status)
+        history = obj.convergence_history
+        if 'parameters' in outputs:
+            obj.export_parameters()
+        if 'plots' in outputs:
+            # rendered concurrently in the background, wait until all are written
+            handles = [obj.create_prop_curve(), obj.create_motor_curve(), obj.velocity_sweep()]
+            for handle in handles:
+                handle.result()
+        if 'step' in outputs:
+            obj.export_step()
+    except Exception as error:
+        record.update(status='failed', error=repr(error), traceback=traceback.format_exc())
+    finally:
+        # a failing profile only costs the profile, not the design
+        if PROFILER.enabled:
+            try:
+                PROFILER.disable()
+                PROFILER.write_summary(os.path.join(output_dir, 'profile', 'summary.txt'))
+            except Exception as error:
+                __init__.generate_warning("Profile not written", repr(error))
+    record['warnings'] = list(__init__.WARNINGS)
+    record['runtime'] = time.time() - start
+    if results_file is not None:
+        # e.g. the database stayed locked by other workers beyond the timeout, the record is still returned
+        try:
+            store = ResultsStore(results_file)
+            try:
+                store.append(record, history)
+            finally:
+                store.close()
+        except Exception as error:
+            __init__.generate_warning("Results not stored", repr(error))
+            record['warnings'] = list(__init__.WARNINGS)
+    return record
+
+
+# summary of all finished designs, replaced atomically so an interrupted batch keeps the designs finished so far
+def write_summary(records, output_dir):
+    path = os.path.join(output_dir, 'summary.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(sorted(records, key=lambda record: record['name']), f, indent=2, default=str)
+    os.replace(path + '.tmp', path)
+
+
+def run_batch(designs, output_dir='Outputs/batch', workers=None, outputs=('parameters',)):
+    os.makedirs(output_dir, exist_ok=True)
+    records = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(run_design, name, inputs, os.path.join(output_dir, name), outputs,
+                                   os.path.join(output_dir, RESULTS_FILE)): (name, inputs)
+                       for name, inputs in designs}
+            for future in as_completed(futures):
+                name, inputs = futures[future]
+                try:
+                    record = future.result()
+                except Exception as error:
+                    # the worker died (e.g. a crash in MATLAB or OCC breaks the pool) or failed outside run_design
+                    record = {'name': name, 'inputs': inputs, 'output_dir': os.path.join(output_dir, name),
+                              'status': 'failed', 'error': repr(error), 'warnings': [], 'runtime': None}
+                print("{}: {} ({} s, {} warnings)".format(
+                    record['name'], record['status'],
+                    '-' if record['runtime'] is None else '{:.0f}'.format(record['runtime']),
+                    len(record['warnings'])))
+                records.append(record)
+                write_summary(records, output_dir)
+    finally:
+        write_summary(records, output_dir)
+    records.sort(key=lambda record: record['name'])
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Size many drone designs without GUI.")
+    parser.add_argument('designs', help="table of designs (.csv or .xlsx), one row per design")
+    parser.add_argument('--output', default='Outputs/batch', help="output folder, one sub folder per design")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--plots', action='store_true', help="create the prop, motor and velocity sweep plots")
+    parser.add_argument('--step', action='store_true', help="export a STEP file of every design")
+    parser.add_argument('--profile', action='store_true',
+                        help="write a profile summary and a Chrome trace of every iteration pass of every design")
+    args = parser.parse_args()
+
+    outputs = ['parameters'] + (['plots'] if args.plots else []) + (['step'] if args.step else []) \
+        + (['profile'] if args.profile else [])
+    run_batch(read_design_specs(args.designs), args.output, args.workers, outputs)
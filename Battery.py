@@ -5,6 +5,8 @@ from parapy.geom import Box
 from parapy.geom.generic.positioning import Position, Point, Orientation
 import math
 import numpy as np
+from StepExport import point_key
+from Mission import battery_pack
 
 class Battery(Base):
     cap = Input()                   # in Ah
@@ -14,6 +16,9 @@ class Battery(Base):
     voltage_per_cell = Input(4.2)   # in V
     cell_diameter = Input(19)       # in mm
     cell_height = Input(65)         # in mm
+    internal_resistance_per_cell = Input(0.03)  # in Ohm
+    peukert_exponent = Input(1.05)
+    cutoff_voltage_per_cell = Input(3.0)        # in V
     cog = Input(Point(0, 0, 0), validator=IsInstance(Point))
 
     # calculate batteries width based on the payloads width
@@ -50,6 +55,17 @@ class Battery(Base):
     def weight(self):
         return 9.80665 * .044 * self.num_cells
 
+    # parameters of the pack for the mission simulation (see Mission.py)
+    @Attribute
+    def pack(self):
+        return battery_pack(self.capacity, self.cells, self.voltage_per_cell, self.internal_resistance_per_cell,
+                            self.peukert_exponent, self.cutoff_voltage_per_cell, parallel=self.num_cells/self.cells)
+
+    # values defining the geometry of the battery, key in the STEP cache (StepExport.py)
+    @Attribute
+    def geometry_key(self):
+        return [self.length, self.width, self.height, point_key(self.cog)]
+
     @Part
     def body(self):
         return Box(self.length, self.width, self.height,
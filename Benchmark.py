@@ -0,0 +1,375 @@
+import argparse
+import glob
+import json
+import os
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Benchmark suite of the hot paths of a design run: propeller tables, operating points, motor selection, airfoils,
+# geometry and a full Aircraft.iterate. By default MATLAB is replaced by the deterministic stand-in of
+# Benchmarks/matlab_standin, so the suite runs on any machine and the timings do not depend on the Q3D solver. Q3D
+# results are cached in a temporary folder only, the cache of the app is not touched. Benchmarks that need ParaPy are
+# reported as skipped where it is not installed.
+#
+#   python Benchmark.py run --save baseline          store the timings in Benchmarks/baselines/baseline.json
+#   python Benchmark.py run --save current
+#   python Benchmark.py compare baseline current     flag benchmarks that got slower than the threshold
+#   python Benchmark.py check                        run the correctness checks of the optimised code paths
+#
+# Short benchmarks are run in loops of at least MIN_TIME per measurement. Every measurement is repeated and the minimum
+# time per call is used for the comparison, as it is the least affected by other load on the machine.
+
+BENCHMARK_DIR = 'Benchmarks'
+STANDIN_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, 'matlab_standin'))
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, 'baselines')
+
+MIN_TIME = 0.2          # minimum duration of one measurement in s
+
+BENCHMARKS = OrderedDict()
+CHECKS = OrderedDict()
+
+
+# register a benchmark. The function does the (untimed) setup and returns the callable that is timed.
+def benchmark(name, parapy=False):
+    def register(function):
+        BENCHMARKS[name] = (function, parapy)
+        return function
+    return register
+
+
+# register a correctness check, the function raises an AssertionError if the check fails
+def check(name):
+    def register(function):
+        CHECKS[name] = function
+        return function
+    return register
+
+
+@benchmark('prop_table_parse')
+def prop_table_parse():
+    from PropData import parse_prop_file, PROP_DATA_DIR
+    return lambda: parse_prop_file(os.path.join(PROP_DATA_DIR, 'P8x6.dat'))
+
+
+@benchmark('prop_table_cached')
+def prop_table_cached():
+    import PropData
+    PropData.import_prop_file('P8x6.dat')        # make sure the .npz cache exists
+
+    def load():
+        PropData._loaded.clear()
+        return PropData.import_prop_file('P8x6.dat')
+    return load
+
+
+@benchmark('prop_operating_point')
+def prop_operating_point():
+    from PropData import import_prop_file
+    from PropMap import PropellerMap
+    prop_map = PropellerMap(*import_prop_file('P8x6.dat'))
+    random = np.random.RandomState(0)
+    velocities, thrusts = random.uniform(20, 150, 1000), random.uniform(1, 20, 1000)
+    return lambda: prop_map.operating_point(velocities, thrusts)
+
+
+@benchmark('motor_selection')
+def motor_selection():
+    from MotorSelection import load_motor_data, select_motor
+    motor_data = load_motor_data()
+    random = np.random.RandomState(0)
+    speeds, torques = random.uniform(50, 250, 200), random.uniform(0.05, 1.0, 200)
+    return lambda: [select_motor(motor_data, speed, torque, 4.2 * 4) for speed, torque in zip(speeds, torques)]
+
+
+@benchmark('compatibility_build')
+def compatibility_build():
+    from Compatibility import build_compatibility, _prop_files
+    from MotorSelection import load_motor_data
+    from PropData import PROP_DATA_DIR
+    motor_data, prop_files = load_motor_data(), _prop_files(PROP_DATA_DIR)
+    return lambda: build_compatibility(motor_data, prop_files)
+
+
+@benchmark('cst_fit')
+def cst_fit():
+    from AirfoilData import load_airfoil
+    from CST import fit_cst
+    points = load_airfoil('whitcomb')[::-1]
+    return lambda: fit_cst(points)
+
+
+@benchmark('airfoil_parse')
+def airfoil_parse():
+    import AirfoilData
+    names = [os.path.basename(path) for path in sorted(glob.glob(os.path.join('Airfoil_data', '*.dat')))]
+
+    def parse():
+        AirfoilData._loaded.clear()
+        return [AirfoilData.load_airfoil(name) for name in names]
+    return parse
+
+
+@benchmark('mission_simulation')
+def mission_simulation():
+    from Mission import mission_profile, battery_pack, simulate_mission
+    from PropData import import_prop_file
+    from PropMap import PropellerMap
+    prop_map = PropellerMap(*import_prop_file('P10x6.dat'))
+    velocities = np.linspace(50, 150, 11)
+    dynamic_pressure = 1.225 / 2 * (velocities / 3.6) ** 2
+    drags = dynamic_pressure * 0.8 * (0.015 + 0.04 * (40 / (dynamic_pressure * 0.8)) ** 2)
+    phases = mission_profile(65, np.linspace(70, 130, 1000), 1800)
+    battery = battery_pack(np.linspace(5, 20, 1000), 4, 4.2, 0.03, parallel=4)
+    return lambda: simulate_mission(phases, velocities, drags, 40, prop_map, 2, 0.06, 0.1, 25, battery, dt=5)
+
+
+def _aircraft(output_dir):
+    from Aircraft import Aircraft, read_input_file
+    return Aircraft(output_dir=output_dir, **read_input_file(os.path.join('Inputs', 'Input_data.xlsx')))
+
+
+@benchmark('engine_variable_velocity', parapy=True)
+def engine_variable_velocity():
+    aircraft = _aircraft(_temporary_dir())
+    aircraft.iterate()
+    engine = aircraft.engines[0]
+    velocities = np.linspace(30, 200, 50)
+    drags = np.linspace(2, 15, 50)
+    return lambda: engine.variable_velocity(velocities, drags)
+
+
+@benchmark('geometry_build', parapy=True)
+def geometry_build():
+    def build():
+        aircraft = _aircraft(_temporary_dir())
+        return [aircraft.fuselage.fuselage_lofted_surf.area, aircraft.right_wing.area, aircraft.left_wing.area,
+                aircraft.tail_right_wing.area, aircraft.tail_left_wing.area, aircraft.vertical_tail.area]
+    return build
+
+
+@benchmark('aircraft_iterate', parapy=True)
+def aircraft_iterate():
+    def iterate():
+        _reset_q3d_cache()
+        aircraft = _aircraft(_temporary_dir())
+        aircraft.iterate()
+        return aircraft.total_weight
+    return iterate
+
+
+_temporary = []
+
+
+def _temporary_dir():
+    directory = tempfile.mkdtemp(prefix='kbe_benchmark_')
+    _temporary.append(directory)
+    return directory
+
+
+# empty Q3D cache in a temporary folder, so every run of the stand-in is measured
+def _reset_q3d_cache():
+    from Q3DCache import Q3D_CACHE
+    with Q3D_CACHE._lock:
+        Q3D_CACHE.cache_dir = _temporary_dir()
+        Q3D_CACHE._memory.clear()
+        Q3D_CACHE._index = None
+
+
+def run_benchmarks(names=None, repeat=5):
+    results = OrderedDict()
+    for name, (function, parapy) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            if parapy:
+                import parapy.core
+            _reset_q3d_cache()
+            timed = function()
+            number = 1
+            while _measure(timed, number) < MIN_TIME:
+                number *= 10
+            times = [_measure(timed, number) / number for _ in range(repeat)]
+        except ImportError as error:
+            results[name] = {'status': 'skipped', 'reason': str(error)}
+            print("{:<28} skipped ({})".format(name, error))
+            continue
+        results[name] = {'status': 'ok', 'min': min(times), 'median': float(np.median(times)), 'repeat': repeat,
+                         'number': number}
+        print("{:<28} {:>10.6f} s (median {:.6f} s)".format(name, min(times), np.median(times)))
+    for directory in _temporary:
+        shutil.rmtree(directory, ignore_errors=True)
+    del _temporary[:]
+    return results
+
+
+def _measure(timed, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        timed()
+    return time.perf_counter() - start
+
+
+# Q3D inputs of a small wing for the stand-in engine
+Q3D_ARGS = ([[0, 0, 0, 0.3], [0, 1, 0, 0.2]], 2.0, 1, [0.2] * 12, [0.2] * 12, 1.225, 25.0, 5e5, 0.5)
+
+
+@check('engine_pool_sequential')
+def engine_pool_sequential():
+    import matlab.engine
+    from EnginePool import MatlabEnginePool
+    started = []
+
+    def start_engine(slot):
+        started.append(slot)
+        return matlab.engine.start_matlab()
+
+    pool = MatlabEnginePool(size=3, start_engine=start_engine)
+    for _ in range(5):
+        pool.call('run_q3d', *Q3D_ARGS, nargout=2)
+    assert started == [0], "sequential calls started the engines {}".format(started)
+    pool.shutdown()
+
+
+# The propeller map reproduces thrust and torque of every point of every propeller table, and the operating point of
+# every table point with a thrust of at least 1 % of the table maximum delivers its thrust. Where a table is not
+# monotonic in RPM the same thrust is reached at another RPM, so the RPM is not compared.
+@check('prop_map_table_points')
+def prop_map_table_points():
+    from PropData import import_prop_file, PROP_DATA_DIR
+    from PropMap import PropellerMap
+    for path in sorted(glob.glob(os.path.join(PROP_DATA_DIR, '*.dat'))):
+        characteristics, rpm = import_prop_file(os.path.basename(path))
+        prop_map = PropellerMap(characteristics, rpm)
+        velocity, torque, thrust = characteristics[:, 0, :], characteristics[:, 6, :], characteristics[:, 7, :]
+        speed = np.ones(velocity.shape) * rpm / 60
+        points = ~(np.isnan(velocity) | np.isnan(torque) | np.isnan(thrust))
+        name = os.path.basename(path)
+        assert np.allclose(prop_map.thrust(speed[points], velocity[points] / 3.6), thrust[points],
+                           rtol=1e-9, atol=1e-9), "thrust of {} not reproduced".format(name)
+        assert np.allclose(prop_map.torque(speed[points], velocity[points] / 3.6), torque[points],
+                           rtol=1e-9, atol=1e-9), "torque of {} not reproduced".format(name)
+
+        points &= thrust >= 0.01 * np.nanmax(thrust)
+        _, _, op_thrust, valid = prop_map.operating_point(velocity[points], thrust[points])
+        delivered = np.isclose(op_thrust, thrust[points], rtol=1e-6)
+        # points above the thrust of the highest RPM at their velocity can only occur in non-monotonic tables
+        above_max = thrust[points] > prop_map.thrust(prop_map.speeds[-1], velocity[points] / 3.6)
+        assert np.all(delivered | (~valid & above_max)), "operating points of {} do not deliver the table thrust " \
+            "at velocities {}".format(name, velocity[points][~(delivered | (~valid & above_max))])
+
+
+# The merged STEP assembly numbers the entities of all components uniquely and keeps their references, but not the
+# references in string literals.
+@check('step_merge')
+def step_merge():
+    from StepExport import merge_step_files
+    component = "ISO-10303-21;\nHEADER;\nFILE_SCHEMA(('AUTOMOTIVE_DESIGN'));\nENDSEC;\nDATA;\n" \
+                "#1 = PRODUCT('{0}','{0} #2','',(#2));\n#2 = PRODUCT_CONTEXT('',#1,'mechanical');\n" \
+                "ENDSEC;\nEND-ISO-10303-21;\n"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for name in ('wing', 'tail'):
+            paths.append(os.path.join(tmp_dir, name + '.stp'))
+            with open(paths[-1], 'w') as f:
+                f.write(component.format(name))
+        merge_step_files(paths, os.path.join(tmp_dir, 'assembly.stp'))
+        with open(os.path.join(tmp_dir, 'assembly.stp')) as f:
+            merged = f.read()
+    expected = component.format('wing').replace('ENDSEC;\nEND', "#3 = PRODUCT('tail','tail #2','',(#4));\n"
+                                                "#4 = PRODUCT_CONTEXT('',#3,'mechanical');\nENDSEC;\nEND")
+    assert merged == expected, "unexpected merged STEP file:\n" + merged
+
+
+def run_checks(names=None):
+    failed = []
+    for name, function in CHECKS.items():
+        if names and name not in names:
+            continue
+        try:
+            function()
+        except ImportError as error:
+            print("{:<28} skipped ({})".format(name, error))
+            continue
+        except AssertionError as error:
+            print("{:<28} FAILED: {}".format(name, error))
+            failed.append(name)
+            continue
+        print("{:<28} ok".format(name))
+    return failed
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def save_results(results, name, live_matlab):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    data = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(),
+            'matlab': 'live' if live_matlab else 'stand-in', 'benchmarks': results}
+    with open(baseline_path(name), 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+# benchmarks of current that are slower than in baseline by more than the threshold (relative), as (name, ratio)
+def compare_results(baseline, current, threshold=0.3):
+    regressions = []
+    print("{:<28} {:>10} {:>10} {:>8}".format('benchmark', 'baseline', 'current', 'ratio'))
+    for name, result in current['benchmarks'].items():
+        reference = baseline['benchmarks'].get(name)
+        if result['status'] != 'ok' or reference is None or reference['status'] != 'ok':
+            continue
+        ratio = result['min'] / reference['min']
+        flag = ' REGRESSION' if ratio > 1 + threshold else ''
+        print("{:<28} {:>10.6f} {:>10.6f} {:>8.2f}{}".format(name, reference['min'], result['min'], ratio, flag))
+        if flag:
+            regressions.append((name, ratio))
+    if baseline.get('matlab') != current.get('matlab'):
+        print("Warning: baseline and current results were measured with different MATLAB engines")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the benchmarks and compare them with stored baselines.")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="run the benchmarks")
+    run_parser.add_argument('names', nargs='*', help="benchmarks to run, all by default")
+    run_parser.add_argument('--repeat', type=int, default=5, help="number of timed runs per benchmark")
+    run_parser.add_argument('--save', help="store the results as baseline with this name")
+    run_parser.add_argument('--live-matlab', action='store_true', help="use MATLAB instead of the stand-in")
+    compare_parser = subparsers.add_parser('compare', help="compare two stored results")
+    compare_parser.add_argument('baseline', help="name or path of the baseline")
+    compare_parser.add_argument('current', help="name or path of the results to check")
+    compare_parser.add_argument('--threshold', type=float, default=0.3, help="allowed relative slow down")
+    check_parser = subparsers.add_parser('check', help="run the correctness checks with the MATLAB stand-in")
+    check_parser.add_argument('names', nargs='*', help="checks to run, all by default")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        os.environ['KBE_HEADLESS'] = '1'
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+        if not args.live_matlab:
+            sys.path.insert(0, STANDIN_DIR)
+        results = run_benchmarks(args.names, args.repeat)
+        if args.save:
+            save_results(results, args.save, args.live_matlab)
+    elif args.command == 'compare':
+        with open(baseline_path(args.baseline)) as f:
+            baseline = json.load(f)
+        with open(baseline_path(args.current)) as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        sys.exit(1 if regressions else 0)
+    elif args.command == 'check':
+        os.environ['KBE_HEADLESS'] = '1'
+        sys.path.insert(0, STANDIN_DIR)
+        sys.exit(1 if run_checks(args.names) else 0)
+    else:
+        parser.print_help()
@@ -0,0 +1,12 @@
+import numpy as np
+
+# Deterministic stand-in for the MATLAB Engine API for Python, used by the benchmarks (Benchmark.py) on machines
+# without MATLAB. Only the parts used by the app are provided: matlab.double and matlab.engine with importPropFile,
+# demo, run_q3d and run_q3d_batch (see engine.py). The stand-in is only put on the path by the benchmark runner.
+
+
+class double(list):
+    def __init__(self, initializer=None):
+        values = np.atleast_2d(np.asarray([] if initializer is None else initializer, dtype=float))
+        super().__init__(values.tolist())
+        self.size = values.shape
@@ -0,0 +1,168 @@
+import os.path
+import sys
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import matlab
+
+# Stand-in for matlab.engine. The functions of the Q3D folder are replaced by cheap analytical models, so the results
+# are deterministic and do not depend on a MATLAB installation:
+# - importPropFile and demo return the same values as PropData.import_prop_file and CST.fit_cst
+# - run_q3d returns a parabolic drag polar, CD = CD0(Re) + CL^2/(pi*AR*e), with the lift curve of a finite wing
+# The environment variable MATLAB_STANDIN_DELAY (in s) adds a fixed delay per Q3D run to mimic the solver.
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+OSWALD_FACTOR = 0.8
+
+
+class EngineError(Exception):
+    pass
+
+
+class MatlabExecutionError(Exception):
+    pass
+
+
+class RejectedExecutionError(Exception):
+    pass
+
+
+class CancelledError(Exception):
+    pass
+
+
+class TimeoutError(Exception):
+    pass
+
+
+class FutureResult:
+    def __init__(self, future):
+        self._future = future
+
+    # raises TimeoutError of this module like matlab.engine, not the one of concurrent.futures
+    def result(self, timeout=None):
+        try:
+            return self._future.result(timeout=timeout)
+        except futures.TimeoutError:
+            raise TimeoutError("The result is not available within {} s".format(timeout)) from None
+
+    def cancel(self):
+        return self._future.cancel()
+
+    def done(self):
+        return self._future.done()
+
+
+def _values(value):
+    return np.asarray(value, dtype=float)
+
+
+def _scalar(value):
+    return float(np.ravel(_values(value))[0])
+
+
+def _q3d(geometry, incidence, visc_option, root_cst, tip_cst, air_density, velocity, reynolds_number, cl):
+    geometry = _values(geometry)
+    span = 2 * abs(geometry[1, 1] - geometry[0, 1])
+    area = span * (geometry[0, 3] + geometry[1, 3]) / 2
+    aspect_ratio = span ** 2 / area
+    thickness = np.sum(np.abs(_values(root_cst))) / 16
+
+    # flat plate friction with a form factor of the airfoil thickness, zero for inviscid runs
+    cd0 = _scalar(visc_option) * 0.074 * _scalar(reynolds_number) ** -0.2 * 2 * (1 + 2 * thickness)
+    cl = _scalar(cl)
+    cdi = cl ** 2 / (np.pi * aspect_ratio * OSWALD_FACTOR)
+    lift_slope = 2 * np.pi * aspect_ratio / (2 + np.sqrt(4 + aspect_ratio ** 2))
+    alpha = np.degrees(cl / lift_slope) - _scalar(incidence)
+
+    res = {'CLwing': cl, 'CDwing': cd0 + cdi, 'Alfa': float(alpha),
+           'Wing': {'cl': matlab.double([cl, cl]), 'Yst': matlab.double([0, span / 2])}}
+    ac = {'Wing': {'Geom': matlab.double(geometry.tolist()), 'inc': _scalar(incidence),
+                   'Airfoils': matlab.double([list(np.ravel(root_cst)), list(np.ravel(tip_cst))]),
+                   'eta': matlab.double([[0], [1]])},
+          'Visc': _scalar(visc_option),
+          'Aero': {'V': _scalar(velocity), 'rho': _scalar(air_density), 'alt': 0.0,
+                   'Re': _scalar(reynolds_number), 'M': 0.2, 'CL': cl}}
+    return res, ac
+
+
+class MatlabEngine:
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.delay = float(os.environ.get('MATLAB_STANDIN_DELAY', 0))
+
+    def _call(self, function, args, nargout, background):
+        if self._closed:
+            raise RejectedExecutionError("The engine has been shut down")
+        future = self._executor.submit(self._evaluate, function, args, nargout)
+        if background:
+            return FutureResult(future)
+        return future.result()
+
+    def _evaluate(self, function, args, nargout):
+        result = function(*args)
+        if nargout == 0:
+            return None
+        if nargout == 1 and isinstance(result, tuple):
+            return result[0]
+        return result
+
+    def cd(self, path, nargout=1, background=False):
+        return path
+
+    def quit(self):
+        self._closed = True
+        self._executor.shutdown(wait=False)
+
+    def importPropFile(self, filename, *args, nargout=1, background=False):
+        def import_prop_file(filename):
+            if REPO_DIR not in sys.path:
+                sys.path.append(REPO_DIR)
+            from PropData import import_prop_file
+            characteristics, rpm = import_prop_file(filename)
+            return matlab.double(characteristics.tolist()), matlab.double(rpm.tolist())
+        return self._call(import_prop_file, (filename,), nargout, background)
+
+    def demo(self, data, nargout=1, background=False):
+        def demo(data):
+            if REPO_DIR not in sys.path:
+                sys.path.append(REPO_DIR)
+            from CST import fit_cst
+            return matlab.double(fit_cst(_values(data)).tolist())
+        return self._call(demo, (data,), nargout, background)
+
+    def run_q3d(self, *args, nargout=1, background=False):
+        def run_q3d(*args):
+            time.sleep(self.delay)
+            return _q3d(*args)
+        return self._call(run_q3d, args, nargout, background)
+
+    def run_q3d_batch(self, geometry, incidence, visc_option, root_cst, tip_cst, air_density, velocities,
+                      reynolds_numbers, cls, nargout=1, background=False):
+        def run_q3d_batch():
+            results = []
+            for velocity, reynolds_number, cl in zip(np.ravel(_values(velocities)), np.ravel(_values(reynolds_numbers)),
+                                                     np.ravel(_values(cls))):
+                time.sleep(self.delay)
+                results.append(_q3d(geometry, incidence, visc_option, root_cst, tip_cst, air_density, velocity,
+                                    reynolds_number, cl))
+            return [res for res, _ in results], [ac for _, ac in results]
+        return self._call(run_q3d_batch, (), nargout, background)
+
+
+def start_matlab(*args, **kwargs):
+    return MatlabEngine()
+
+
+def find_matlab():
+    return ()
+
+
+def connect_matlab(name=None, **kwargs):
+    raise EngineError("The MATLAB stand-in has no shared sessions")
@@ -0,0 +1,68 @@
+import numpy as np
+from math import factorial
+from scipy.optimize import linprog
+
+# Native version of Q3D/demo.m, airfoilfit.m and CST_airfoil_fit.m. With the class function fixed (N1 = 0.5, N2 = 1)
+# a CST airfoil is linear in its Bernstein weights, so the fit of demo.m (minimal mean absolute error, weights between
+# -1 and 1) is a small linear program instead of an fmincon run.
+
+N1 = 0.5
+N2 = 1
+NUM_WEIGHTS = 8         # arranged as [wl wu], the lower and upper surface weights
+
+
+# class function times the Bernstein polynomials of the shape function, one column per weight
+# (x is clipped to the chord, as some data files hold points marginally in front of the leading edge or behind the
+# trailing edge)
+def class_shape_matrix(x, num_weights, n1=N1, n2=N2):
+    x = np.clip(np.asarray(x, dtype=float), 0, 1)
+    n = num_weights - 1
+    k = np.arange(num_weights)
+    binomial = np.array([factorial(n) / (factorial(i) * factorial(n - i)) for i in k])
+    bernstein = binomial * x[:, None] ** k * (1 - x[:, None]) ** (n - k)
+    return (x ** n1 * (1 - x) ** n2)[:, None] * bernstein
+
+
+# matrix mapping the weights [wl wu] onto the y coordinates of the stacked lower and upper surface points
+def cst_matrix(xl, xu, num_weights=NUM_WEIGHTS):
+    half = num_weights // 2
+    matrix = np.zeros((len(xl) + len(xu), num_weights))
+    matrix[:len(xl), :half] = class_shape_matrix(xl, half)
+    matrix[len(xl):, half:] = class_shape_matrix(xu, half)
+    return matrix
+
+
+# y coordinates of the CST airfoil with weights W, like CST_airfoil_fit.m
+def cst_airfoil(W, xl, xu, dz=0):
+    W = np.asarray(W, dtype=float)
+    te = np.concatenate((-dz * np.asarray(xl, dtype=float), dz * np.asarray(xu, dtype=float)))
+    return cst_matrix(xl, xu, W.shape[0]) @ W + te
+
+
+# split the point list of Airfoil.yt_xl_xu (lower surface from the trailing edge, then upper surface from the leading
+# edge) into the target y coordinates and the x coordinates of both surfaces, as done in demo.m
+def split_surfaces(points):
+    data = np.asarray(points, dtype=float)
+    idx = np.flatnonzero(data[:, 0] == 0)[0]
+    return data[:, 1], data[:idx, 0], data[idx:, 0]
+
+
+# CST weights [wl wu] of the airfoil given by the Airfoil.yt_xl_xu point list, minimising the mean absolute error of
+# the y coordinates with all weights bounded between -1 and 1 (same problem as solved by demo.m)
+def fit_cst(points, num_weights=NUM_WEIGHTS, dz=0):
+    yt, xl, xu = split_surfaces(points)
+    matrix = cst_matrix(xl, xu, num_weights)
+    target = yt - np.concatenate((-dz * xl, dz * xu))
+    num_points = matrix.shape[0]
+
+    # variables are the weights followed by one error bound e_i >= |matrix_i @ W - target_i| per point
+    cost = np.concatenate((np.zeros(num_weights), np.ones(num_points) / num_points))
+    identity = np.eye(num_points)
+    a_ub = np.block([[matrix, -identity], [-matrix, -identity]])
+    b_ub = np.concatenate((target, -target))
+    bounds = [(-1, 1)] * num_weights + [(0, None)] * num_points
+
+    result = linprog(cost, A_ub=a_ub, b_ub=b_ub, bounds=bounds, method='highs')
+    if not result.success:
+        raise RuntimeError("CST fit failed: " + result.message)
+    return result.x[:num_weights]
@@ -0,0 +1,132 @@
+import glob
+import hashlib
+import os
+import os.path
+
+import numpy as np
+
+from MotorSelection import load_motor_data, motor_operating_points, MOTOR_DATA_FILE, NAME, MAX_CURRENT, MAX_VOLTAGE
+from PropData import import_prop_file, PROP_DATA_DIR, CACHE_DIR, NUM_ROWS
+from PropMap import PropellerMap
+
+# Motor x propeller compatibility matrix. For every motor of the catalog and every propeller of the Prop_data folder
+# the motor voltage, current and validity are evaluated over the whole propeller table (30 rows x RPM blocks). The
+# tensors are stored in Prop_data/__cache__, keyed on the modification times of all input files, so questions like
+# "which motors can drive an 8x6 at 80 km/h and 12 N" are answered without building any Engine or Motor.
+
+COMPATIBILITY_FILE = os.path.join(CACHE_DIR, 'compatibility.npz')
+COMPATIBILITY_VERSION = 3       # increase when the stored format or the propeller map changes
+
+
+class CompatibilityMatrix:
+    def __init__(self, motor_names, motor_data, prop_names, rpm, torque, voltage, current, valid):
+        self.motor_names = [str(name) for name in motor_names]
+        self.motor_data = motor_data        # compiled motor catalog (see MotorSelection.py)
+        # propellers in the format of Aircraft.propeller, e.g. '8x6'
+        self.prop_names = [str(name) for name in prop_names]
+        self.rpm = rpm                      # (props, RPM blocks), NaN padded
+        self.torque = torque                # (props, rows, RPM blocks), in Nm
+        self.voltage = voltage              # (motors, props, rows, RPM blocks), in V
+        self.current = current              # (motors, props, rows, RPM blocks), in A
+        self.valid = valid                  # current and voltage within the motor ratings
+        self._maps = {}
+
+    def prop_index(self, prop):
+        return self.prop_names.index(prop)
+
+    # continuous operating map of a propeller of the matrix
+    def prop_map(self, prop):
+        if prop not in self._maps:
+            self._maps[prop] = PropellerMap(*import_prop_file('P' + prop + '.dat'))
+        return self._maps[prop]
+
+    # fraction of the propeller table that every motor can drive
+    def coverage(self, prop):
+        p = self.prop_index(prop)
+        table = ~np.isnan(self.torque[p])
+        return self.valid[:, p].sum(axis=(1, 2)) / table.sum()
+
+    # indices of the motors able to drive the propeller at the given velocity (in km/h) and thrust (in N). The supply
+    # voltage defaults to the rated voltage of each motor.
+    def compatible_motors(self, prop, velocity, thrust, supply_voltage=None):
+        rpm, torque, _, prop_valid = self.prop_map(prop).operating_point(velocity, thrust)
+        if not prop_valid:
+            return []
+        current, voltage = motor_operating_points(self.motor_data, rpm / 60, torque)
+        if supply_voltage is None:
+            supply_voltage = self.motor_data[MAX_VOLTAGE]
+        valid = (current <= self.motor_data[MAX_CURRENT]) & (voltage <= supply_voltage)
+        return np.flatnonzero(valid).tolist()
+
+
+def _prop_files(prop_dir):
+    return sorted(glob.glob(os.path.join(prop_dir, 'P*.dat')))
+
+
+# hash of the format version and the modification times of all input files, the stored matrix is rebuilt as soon as
+# one of them changes
+def _input_key(motor_file, prop_files):
+    digest = hashlib.sha256(str(COMPATIBILITY_VERSION).encode())
+    for path in [motor_file] + prop_files:
+        digest.update('{}:{}'.format(os.path.basename(path), os.stat(path).st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def build_compatibility(motor_data, prop_files):
+    motor_data = np.array(motor_data)
+
+    prop_names = [os.path.basename(path)[1:-4] for path in prop_files]
+    tables = [import_prop_file(os.path.basename(path)) for path in prop_files]
+    num_blocks = max(rpm.shape[0] for _, rpm in tables)
+
+    rpm = np.full((len(tables), num_blocks), np.nan)
+    torque = np.full((len(tables), NUM_ROWS, num_blocks), np.nan)
+    for p, (characteristics, prop_rpm) in enumerate(tables):
+        rpm[p, :prop_rpm.shape[0]] = prop_rpm
+        torque[p, :, :prop_rpm.shape[0]] = characteristics[:, 6, :]
+
+    # broadcast motors (first axis) against all propeller tables
+    motors = motor_data[:, None, None, None]
+    current, voltage = motor_operating_points(motors, rpm[None, :, None, :] / 60, torque[None])
+    with np.errstate(invalid='ignore'):
+        valid = (current <= motors[MAX_CURRENT]) & (voltage <= motors[MAX_VOLTAGE])
+    return CompatibilityMatrix(motor_data[NAME], motor_data, prop_names, rpm, torque, voltage.astype(np.float32),
+                               current.astype(np.float32), valid)
+
+
+_loaded = {}
+
+
+# compatibility matrix of the motor catalog and the propeller folder, from memory or the stored cache if up to date
+def load_compatibility(motor_file=MOTOR_DATA_FILE):
+    prop_files = _prop_files(PROP_DATA_DIR)
+    key = _input_key(motor_file, prop_files)
+    if key in _loaded:
+        return _loaded[key]
+
+    compatibility = None
+    if os.path.exists(COMPATIBILITY_FILE):
+        try:
+            with np.load(COMPATIBILITY_FILE) as cached:
+                if str(cached['key']) == key:
+                    compatibility = CompatibilityMatrix(*(cached[name] for name in (
+                        'motor_names', 'motor_data', 'prop_names', 'rpm', 'torque', 'voltage', 'current', 'valid')))
+        except (OSError, ValueError, KeyError):
+            pass        # unreadable cache, build the matrix again
+
+    if compatibility is None:
+        compatibility = build_compatibility(load_motor_data(motor_file), prop_files)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = COMPATIBILITY_FILE + '.tmp.npz'
+            np.savez_compressed(tmp_path, key=key, motor_names=np.array(compatibility.motor_names),
+                                motor_data=compatibility.motor_data, prop_names=np.array(compatibility.prop_names),
+                                rpm=compatibility.rpm, torque=compatibility.torque, voltage=compatibility.voltage,
+                                current=compatibility.current, valid=compatibility.valid)
+            os.replace(tmp_path, COMPATIBILITY_FILE)
+        except OSError:
+            pass        # cache is optional
+
+    _loaded.clear()
+    _loaded[key] = compatibility
+    return compatibility
@@ -0,0 +1,80 @@
+import hashlib
+import json
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+
+# Surrogate drag polar of a lifting surface. Q3D is run on a small grid of lift coefficients and Reynolds numbers and
+# the drag coefficients are interpolated by a spline in CL and log(Re). A few extra points in between the grid points
+# are evaluated as well, but not used for the fit, to estimate the interpolation error.
+#
+# Fitted polars are kept for the session under a key of everything they depend on (see cached_drag_polar), so a
+# surface whose planform is quantised by the caller reuses the polar over neighbouring sizing iterations.
+
+_fitted = {}
+
+
+class DragPolar:
+    def __init__(self, cl, reynolds, cd):
+        self.cl = np.asarray(cl, dtype=float)               # grid of lift coefficients
+        self.reynolds = np.asarray(reynolds, dtype=float)   # grid of Reynolds numbers
+        self.cd = np.asarray(cd, dtype=float)               # drag coefficients, shape (len(cl), len(reynolds))
+        self._spline = RectBivariateSpline(self.cl, np.log(self.reynolds), self.cd,
+                                           kx=min(3, self.cl.shape[0] - 1), ky=min(2, self.reynolds.shape[0] - 1))
+        self.errors = {}
+
+    # drag coefficient for (arrays of) lift coefficients and Reynolds numbers
+    def __call__(self, cl, reynolds):
+        cl, reynolds = np.broadcast_arrays(np.asarray(cl, dtype=float), np.asarray(reynolds, dtype=float))
+        return self._spline.ev(cl, np.log(reynolds))
+
+    # which points lie within the sampled range, outside of it the polar would extrapolate
+    def inside(self, cl, reynolds):
+        cl, reynolds = np.asarray(cl), np.asarray(reynolds)
+        return (cl >= self.cl[0]) & (cl <= self.cl[-1]) & (reynolds >= self.reynolds[0]) & (reynolds <= self.reynolds[-1])
+
+    # whether all points lie within the sampled range
+    def contains(self, cl, reynolds):
+        return bool(np.all(self.inside(cl, reynolds)))
+
+
+# fit a drag polar. evaluate(cl, reynolds) has to return the drag coefficients for arrays of lift coefficients and
+# Reynolds numbers, it is called once for all sample and check points together.
+def fit_drag_polar(evaluate, cl_range, reynolds_range, num_cl=5, num_reynolds=3, num_check=4):
+    if num_cl < 2 or num_reynolds < 2 or cl_range[0] >= cl_range[1] or reynolds_range[0] >= reynolds_range[1]:
+        raise ValueError("The drag polar needs at least two distinct lift coefficients and Reynolds numbers")
+    cl = np.linspace(cl_range[0], cl_range[1], num_cl)
+    reynolds = np.geomspace(reynolds_range[0], reynolds_range[1], num_reynolds)
+    cl_grid, reynolds_grid = np.meshgrid(cl, reynolds, indexing='ij')
+
+    # check points in the middle of grid cells spread over the range
+    cl_mid = (cl[:-1] + cl[1:]) / 2
+    reynolds_mid = np.sqrt(reynolds[:-1] * reynolds[1:])
+    cells = np.linspace(0, cl_mid.shape[0] * reynolds_mid.shape[0] - 1, num_check).round().astype(int)
+    cl_check = cl_mid[cells % cl_mid.shape[0]]
+    reynolds_check = reynolds_mid[cells // cl_mid.shape[0]]
+
+    cd = np.asarray(evaluate(np.concatenate((cl_grid.ravel(), cl_check)),
+                             np.concatenate((reynolds_grid.ravel(), reynolds_check))), dtype=float)
+    num_samples = cl_grid.size
+    polar = DragPolar(cl, reynolds, cd[:num_samples].reshape(cl_grid.shape))
+
+    if num_check > 0:
+        error = polar(cl_check, reynolds_check) - cd[num_samples:]
+        polar.errors = {'max_abs_error': float(np.max(np.abs(error))),
+                        'rms_error': float(np.sqrt(np.mean(error ** 2))),
+                        'max_rel_error': float(np.max(np.abs(error / cd[num_samples:])))}
+    return polar
+
+
+# fit_drag_polar, reusing the polar fitted before for the same key. key has to contain all values the polar depends on
+# (planform, airfoils, flight condition), the ranges and sample numbers are added here. Returns the polar and whether it
+# was fitted in this call.
+def cached_drag_polar(key, evaluate, cl_range, reynolds_range, num_cl=5, num_reynolds=3, num_check=4):
+    data = json.dumps([key, list(cl_range), list(reynolds_range), num_cl, num_reynolds, num_check], default=float)
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    polar = _fitted.get(digest)
+    if polar is not None:
+        return polar, False
+    polar = _fitted[digest] = fit_drag_polar(evaluate, cl_range, reynolds_range, num_cl, num_reynolds, num_check)
+    return polar, True
@@ -4,6 +4,8 @@ from Propeller import Propeller
 from parapy.geom.generic.positioning import Point, Vector
 from parapy.core.validate import IsInstance
 from Motor import Motor
+from MotorSelection import select_motor, NAME
+from __init__ import generate_warning
 
 import numpy as np
 
@@ -18,46 +20,39 @@ class Engine(Base):
     pos_x = Input()
     pos_y = Input()
     pos_z = Input()
-    iteration_history = Input()
+    visited_motors = Input()        # motor indices selected in all iterations so far
+    motor_objective = Input('mass')  # 'mass' for the lightest feasible motor, 'margin' for the largest reserve
 
-    # iterate over the available motors if the current selection is not viable. There are checks in place to avoid
-    # endless forth and back between two motors if it is apparent that neither is viable. It terminates if a solution is
-    # found or none is likely to be found
+    # select the motor for the current operating point from the whole catalog at once (see MotorSelection.py). Every
+    # selected motor is kept in visited_motors. If a motor that was already used is selected again, the iterations of
+    # the aircraft would cycle through the same motors forever, so the best motor of the cycle for the current operating
+    # point is selected for good and a warning is given. Returns whether the motor was changed.
     @Attribute
     def iterate(self):
-        any_changes = False
-        change = True
-        last_change_direction = 0
-
-        while change:
-            change = False
-            if (not self.motor.voltage_valid) and self.motor.current_valid\
-                    and self.motor.motor_idx < self.motor_data.shape[0] - 1 and (not (last_change_direction < 0))\
-                    and (not (self.iteration_history[1] > 0 > self.iteration_history[2])):
-                change = True
-                any_changes = True
-                last_change_direction = 1
-                self.motor.motor_idx += 1
-            if not self.motor.current_valid and self.motor.voltage_valid and self.motor.motor_idx > 0 \
-                    and not (last_change_direction > 0)\
-                    and not (self.iteration_history[2] > 0 > self.iteration_history[1]):
-                change = True
-                any_changes = True
-                last_change_direction = -1
-                self.motor.motor_idx -= 1
-            if not self.motor.current_valid and not self.motor.voltage_valid and self.motor.motor_idx > 0 \
-                    and not (last_change_direction > 0) \
-                    and self.motor_data[self.motor.motor_idx, 6] < self.motor_data[self.motor.motor_idx-1, 6]\
-                    and not (self.iteration_history[2] > 0 > self.iteration_history[1]):
-                change = True
-                any_changes = True
-                last_change_direction = -1
-                self.motor.motor_idx -= 1
-
-        self.iteration_history[0] = self.iteration_history[1]
-        self.iteration_history[1] = self.iteration_history[2]
-        self.iteration_history[2] = last_change_direction
-        return any_changes
+        current_idx = self.motor.motor_idx
+        if not self.visited_motors:
+            self.visited_motors.append(current_idx)
+        elif self.visited_motors[-1] is None:      # motor fixed after a cycle
+            return False
+
+        motor_idx = select_motor(self.motor_data, self.speed_op, self.torque_op, self.max_voltage,
+                                 self.motor_objective)
+        if motor_idx == current_idx:
+            return False
+        if motor_idx in self.visited_motors:
+            cycle = sorted(set(self.visited_motors[self.visited_motors.index(motor_idx):]))
+            motor_idx = cycle[select_motor(self.motor_data[cycle], self.speed_op, self.torque_op, self.max_voltage,
+                                           self.motor_objective)]
+            msg = "The motor selection of the engine cycles through {}. {} is kept, which is the best of them at the " \
+                  "current operating point.".format(", ".join(self.motor_data[NAME][cycle]),
+                                                    self.motor_data[NAME][motor_idx])
+            generate_warning("Motor selection cycles", msg)
+            self.visited_motors.append(None)
+        else:
+            self.visited_motors.append(motor_idx)
+
+        self.motor.motor_idx = motor_idx
+        return motor_idx != current_idx
 
     @Input
     def cog(self):
@@ -82,27 +77,19 @@ class Engine(Base):
     def current(self):
         return self.motor.current
 
-    # engine operation points for different thrust requirements at different velocities
+    # engine operation points for different thrust requirements at different velocities, evaluated for whole arrays of
+    # velocities and drags at once
     def variable_velocity(self, velocity, drag):
-        operation_points = np.zeros((velocity.shape[0], 2), dtype=int)
-        op_valid = np.zeros_like(velocity, dtype=bool)
-        motor_speed = np.zeros_like(velocity)
-        torque = np.zeros_like(velocity)
-        thrust = np.zeros_like(velocity)
-        voltage = np.zeros_like(velocity)
-        current = np.zeros_like(velocity)
-        for i in range(velocity.shape[0]):
-            # finding propellers operating point
-            operation_points[i, :] = self.propeller.variable_operation_point(velocity[i], drag[i])
-            op_valid[i] = self.propeller.variable_op_valid(velocity[i], drag[i])
-            motor_speed[i] = self.propeller.variable_rpm_op(operation_points[i, :])/60
-            torque[i] = self.propeller.variable_torque_op(operation_points[i, :])
-            thrust[i] = self.propeller.variable_thrust_op(operation_points[i, :])
-
-            # finding motors operating point
-            voltage[i] = self.motor.variable_voltage(motor_speed[i], torque[i])
-            current[i] = self.motor.variable_current(torque[i])
-            op_valid[i] = op_valid[i] and self.motor.variable_valid(motor_speed[i], torque[i])
+        # finding propellers operating points
+        operation_points = self.propeller.variable_operation_point(velocity, drag)
+        motor_speed = self.propeller.variable_rpm_op(operation_points)/60
+        torque = self.propeller.variable_torque_op(operation_points)
+        thrust = self.propeller.variable_thrust_op(operation_points)
+
+        # finding motors operating points
+        voltage = self.motor.variable_voltage(motor_speed, torque)
+        current = self.motor.variable_current(torque)
+        op_valid = operation_points[3] & self.motor.variable_valid(motor_speed, torque)
 
         return motor_speed, torque, thrust, voltage, current, op_valid
 
@@ -0,0 +1,85 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import matlab.engine
+
+from Profiling import PROFILER
+
+# Pool of MATLAB engines. Calls are submitted as futures and run on the first free engine, so independent analyses
+# (e.g. the wing and both tails) are evaluated concurrently. Engines are only started when a slot is used for the first
+# time, by default as new MATLAB processes. Free engines that are already started are always used first, so sequential
+# calls run on a single engine and further engines are only started for concurrent calls. An engine that crashed or
+# did not answer within the timeout is shut down and replaced by a new one, after which the call is repeated once.
+
+
+class MatlabEnginePool:
+    def __init__(self, size=1, start_engine=None, stop_engine=None, timeout=None):
+        self.size = size
+        self.start_engine = start_engine or self._start_engine  # callable(slot) returning a started engine
+        self.stop_engine = stop_engine or self._stop_engine     # callable(engine) shutting an engine down
+        self.timeout = timeout          # maximum time of a single call in s, None for no limit
+        self.restarts = 0
+
+        # free slots as (not started, slot, engine), engine is None as long as it is not started. Started engines come
+        # first, then the lowest slot.
+        self._engines = queue.PriorityQueue()
+        for slot in range(self.size):
+            self._engines.put((True, slot, None))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='matlab')
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _start_engine(slot):
+        return matlab.engine.start_matlab()
+
+    @staticmethod
+    def _stop_engine(engine):
+        try:
+            engine.quit()
+        except Exception:
+            pass                        # the engine is already gone
+
+    def _run(self, function_name, args, nargout):
+        _, slot, engine = self._engines.get()
+        try:
+            for attempt in range(2):
+                if engine is None:
+                    with PROFILER.span('matlab start', slot=slot):
+                        engine = self.start_engine(slot)
+                try:
+                    future = getattr(engine, function_name)(*args, nargout=nargout, background=True)
+                    try:
+                        with PROFILER.span('matlab ' + function_name, slot=slot, attempt=attempt):
+                            return future.result(timeout=self.timeout)
+                    except matlab.engine.TimeoutError:
+                        future.cancel()
+                        raise
+                except matlab.engine.MatlabExecutionError:
+                    raise               # error inside the MATLAB function, the engine itself is fine
+                except (matlab.engine.EngineError, matlab.engine.RejectedExecutionError,
+                        matlab.engine.TimeoutError, matlab.engine.CancelledError):
+                    # hung or crashed engine, replace it and try again
+                    self.stop_engine(engine)
+                    engine = None
+                    with self._lock:
+                        self.restarts += 1
+                    if attempt == 1:
+                        raise
+        finally:
+            self._engines.put((engine is None, slot, engine))
+
+    # call the MATLAB function function_name on a free engine, returns a concurrent.futures.Future of its result
+    def submit(self, function_name, *args, nargout=1):
+        return self._executor.submit(self._run, function_name, args, nargout)
+
+    # blocking version of submit
+    def call(self, function_name, *args, nargout=1):
+        return self.submit(function_name, *args, nargout=nargout).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        while not self._engines.empty():
+            _, _, engine = self._engines.get()
+            if engine is not None:
+                self.stop_engine(engine)
@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import os.path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from Batch import run_design, _init_worker
+from ResultsStore import RESULTS_FILE
+
+# Design-space exploration. All combinations of the given input values (e.g. propellers, number of engines,
+# velocities, airfoil pairs and semi spans) are sized in parallel with the batch runner and the Pareto set over total
+# mass (minimised), endurance margin and lift to drag ratio (both maximised) is extracted from the converged designs.
+#
+# Finished designs are appended to exploration.jsonl in the output folder. Running the same exploration again skips
+# the designs found there as converged or invalid and runs the failed and not converged ones again, so an exploration
+# can be stopped at any time and resumed later. Aerodynamic and propeller data
+# are shared between the designs through the Q3D and propeller caches on disk; the designs are run in the order of the
+# factorial, so neighbouring designs differ in one input only and mostly hit the cache.
+#
+#   python Exploration.py space.json --workers 4 --output Outputs/exploration
+#
+# with space.json holding the inputs common to all designs and the values to explore, e.g.
+#   {"base": {"endurance": 1, "endurance_mode": "T", "structural_material": "PLA"},
+#    "space": {"propeller": ["7x3", "8x6"], "num_engines": [2, 4], "velocity": [80, 100, 120],
+#              "airfoils": [["simm_airfoil", "whitcomb"], ["naca2412", "naca2412"]], "w_semi_span": [1.0, 1.5]}}
+
+JOURNAL_FILE = 'exploration.jsonl'
+DONE = ('converged', 'invalid')     # status of the designs that are not run again on resume
+
+# objectives of the Pareto set as (record key, +1 to maximise or -1 to minimise)
+OBJECTIVES = (('total_mass', -1), ('endurance_margin', 1), ('lift_to_drag', 1))
+
+
+# inputs of all designs of the full factorial, the special key 'airfoils' takes (root, tip) pairs
+def design_space(base, space):
+    keys = list(space)
+    designs = []
+    for values in itertools.product(*(space[key] for key in keys)):
+        inputs = dict(base)
+        for key, value in zip(keys, values):
+            if key == 'airfoils':
+                inputs['airfoil_root'], inputs['airfoil_tip'] = value
+            else:
+                inputs[key] = value
+        designs.append((design_name(inputs), inputs))
+    return designs
+
+
+# name of a design derived from its inputs, so the same design has the same name in every run
+def design_name(inputs):
+    digest = hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+    return 'design_' + digest[:12]
+
+
+def read_journal(output_dir):
+    records = {}
+    path = os.path.join(output_dir, JOURNAL_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue        # incomplete last line of an interrupted run
+                records[record['name']] = record
+    return records
+
+
+# indices of the non-dominated records
+def pareto_front(records, objectives=OBJECTIVES):
+    if not records:
+        return []
+    values = np.array([[sign * record[key] for key, sign in objectives] for record in records])
+    front = []
+    for i in range(values.shape[0]):
+        dominated = np.any(np.all(values >= values[i], axis=1) & np.any(values > values[i], axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def explore(base, space, output_dir='Outputs/exploration', workers=None, outputs=()):
+    os.makedirs(output_dir, exist_ok=True)
+    records = read_journal(output_dir)
+    space_designs = design_space(base, space)
+    designs = [(name, inputs) for name, inputs in space_designs if records.get(name, {}).get('status') not in DONE]
+    print("{} designs done, {} to go".format(len(space_designs) - len(designs), len(designs)))
+
+    with open(os.path.join(output_dir, JOURNAL_FILE), 'a') as journal, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(run_design, name, inputs, os.path.join(output_dir, name), outputs,
+                               os.path.join(output_dir, RESULTS_FILE)): (name, inputs)
+                   for name, inputs in designs}
+        try:
+            for future in as_completed(futures):
+                name, inputs = futures[future]
+                try:
+                    record = future.result()
+                except Exception as error:
+                    # the worker died (e.g. a crash in MATLAB or OCC breaks the pool), retried on resume
+                    record = {'name': name, 'inputs': inputs, 'output_dir': os.path.join(output_dir, name),
+                              'status': 'failed', 'error': repr(error), 'warnings': [], 'runtime': None}
+                print("{}: {}".format(record['name'], record['status']))
+                records[record['name']] = record
+                journal.write(json.dumps(record, default=str) + '\n')
+                journal.flush()
+        except KeyboardInterrupt:
+            print("Exploration stopped, run it again to resume")
+            for future in futures:
+                future.cancel()
+            raise
+
+    converged = [record for record in records.values() if record['status'] == 'converged']
+    pareto = [converged[i] for i in pareto_front(converged)]
+    with open(os.path.join(output_dir, 'pareto.json'), 'w') as f:
+        json.dump(pareto, f, indent=2, default=str)
+    return pareto
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Explore a design space and extract the Pareto set.")
+    parser.add_argument('space', help="JSON file with the 'base' inputs and the 'space' of values to explore")
+    parser.add_argument('--output', default='Outputs/exploration', help="output folder")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    with open(args.space) as f:
+        spec = json.load(f)
+    for record in explore(spec.get('base', {}), spec['space'], args.output, args.workers):
+        print(record['name'], {key: record[key] for key, _ in OBJECTIVES})
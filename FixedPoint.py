@@ -0,0 +1,60 @@
+import numpy as np
+
+# Accelerated fixed point iteration x = g(x) for a few continuous variables. Instead of plain successive substitution
+# (x_next = g(x)) the next estimate is extrapolated from the last iterations with Anderson acceleration; with one
+# variable and a depth of one this is the secant method. Every evaluation of g is expensive (it rebuilds the ParaPy
+# tree and runs Q3D), so saving a few iterations is worth the small linear least squares problem per step.
+
+
+class AndersonAcceleration:
+    def __init__(self, depth=3, damping=1.0):
+        self.depth = depth          # number of previous iterations used for the extrapolation
+        self.damping = damping      # relaxation of the plain fixed point step
+        self.reset()
+
+    def reset(self):
+        self._x, self._f = None, None
+        self._dx, self._df = [], []
+
+    # next estimate from the current estimate x and its image g = g(x)
+    def step(self, x, g):
+        x, g = np.asarray(x, dtype=float), np.asarray(g, dtype=float)
+        f = g - x
+        if self._x is not None:
+            self._dx = (self._dx + [x - self._x])[-self.depth:]
+            self._df = (self._df + [f - self._f])[-self.depth:]
+        self._x, self._f = x, f
+
+        x_next = x + self.damping * f
+        if self.depth > 0 and self._df:
+            dx, df = np.column_stack(self._dx), np.column_stack(self._df)
+            gamma = np.linalg.lstsq(df, f, rcond=None)[0]
+            x_next = x_next - (dx + self.damping * df) @ gamma
+        return x_next
+
+
+# Solve x = func(x) starting at x0, all variables have to be positive. The variables are scaled by their initial
+# image, so the tolerance is relative. converged(x, g) can replace the default test max(|g - x| / |g|) < tolerance,
+# e.g. for variables that are rounded inside of func. Returns the last estimate, its image, the relative residuals of
+# all iterations and whether the iteration converged.
+def solve_fixed_point(func, x0, tolerance=1e-3, max_iterations=50, depth=3, converged=None):
+    x = np.asarray(x0, dtype=float)
+    acceleration = AndersonAcceleration(depth)
+    scale = None
+    residuals = []
+    for _ in range(max_iterations):
+        g = np.asarray(func(x), dtype=float)
+        if scale is None:
+            scale = np.where(np.abs(g) > 0, np.abs(g), 1)
+        residual = np.abs(g - x) / np.where(np.abs(g) > 0, np.abs(g), 1)
+        residuals.append(residual)
+        if converged(x, g) if converged is not None else np.max(residual) < tolerance:
+            return x, g, residuals, True
+
+        x_next = acceleration.step(x / scale, g / scale) * scale
+        if not np.all(np.isfinite(x_next)) or np.any(x_next <= 0):
+            # extrapolated out of the physical range, fall back to a plain step and restart the acceleration
+            acceleration.reset()
+            x_next = g
+        x = x_next
+    return x, g, residuals, False
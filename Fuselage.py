@@ -1,6 +1,8 @@
 from parapy.geom import *
 from parapy.core import *
 from math import *
+from StepExport import position_key
+from __init__ import mesh_deflection
 
 class Fuselage(GeomBase):
 
@@ -45,6 +47,20 @@ class Fuselage(GeomBase):
         return self.payload_section_radius
 
 
+    @Attribute
+    def wetted_area(self):  # analytic area of fuselage_lofted_surf, with cones between the profiles of profile_set
+        radii = self.section_radii
+        return sum(pi*(r1+r2)*sqrt((r1-r2)**2+l**2)
+                   for r1, r2, l in zip(radii[:-1], radii[1:], self.section_lengths))
+
+    @Attribute
+    def geometry_key(self):  # values defining the geometry of the fuselage, key in the STEP cache (StepExport.py)
+        return [self.section_radii, self.section_lengths, self.x_nose, position_key(self.position)]
+
+    @Input          # tessellation of the displayed fuselage, by default based on its size (see __init__.py)
+    def mesh_deflection(self):
+        return mesh_deflection(self.fuselage_length)
+
     @Attribute
     def profiles(self):
         return self.profile_set  # collect the elements of the sequence profile_set
@@ -73,7 +89,7 @@ class Fuselage(GeomBase):
         return LoftedSurface(
             profiles=self.profile_set,
             color="blue",
-            mesh_deflection=0.0001,
+            mesh_deflection=self.mesh_deflection,
             hidden=False
         )
 
@@ -0,0 +1,161 @@
+import numpy as np
+
+# Time-stepped simulation of a mission and the discharge of the battery. A mission is a sequence of phases of constant
+# velocity and climb rate, e.g. catapult launch, climb, cruise, loiter and the approach into the catch arm. For every
+# phase the thrust required (drag plus climb) is converted to an operating point of the propeller (see PropMap.py) and
+# of the motor, which gives the electrical power drawn from the battery. The battery is integrated in time with an open
+# circuit voltage depending on the state of charge, the voltage sag over its internal resistance and Peukert losses.
+#
+# All inputs are broadcast along a first axis of design variants or mission profiles, so thousands of them are
+# integrated together: the operating points of all phases are found in one vectorized call and the time loop works on
+# whole arrays. Variants have to share the propeller, everything else (phases, drag, weight, motor and battery) can
+# differ per variant.
+#
+#   phases = mission_profile(launch_velocity=65, cruise_velocity=100, cruise_time=3600)
+#   result = simulate_mission(phases, velocities, drags, weight, prop_map, 2, k_phi, resistance, max_current, battery)
+
+NAME, DURATION, VELOCITY, CLIMB_RATE = 'name', 'duration', 'velocity', 'climb_rate'
+
+# one phase of a mission: duration in s, velocity in km/h and climb rate in m/s (negative for a descent)
+PHASE_DTYPE = np.dtype([(NAME, 'U16'), (DURATION, 'f8'), (VELOCITY, 'f8'), (CLIMB_RATE, 'f8')])
+
+PHASES = ('launch', 'climb', 'cruise', 'loiter', 'approach')
+
+# open circuit voltage of a lithium-ion cell over the state of charge, relative to the voltage of the full cell
+OCV_SOC = np.array([0.0, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
+OCV = np.array([3.0, 3.3, 3.45, 3.55, 3.62, 3.68, 3.73, 3.79, 3.87, 3.95, 4.06, 4.2]) / 4.2
+
+PEUKERT_RATED_TIME = 1.0        # discharge time (in h) of the rated capacity
+
+
+# Phases of the standard mission for (arrays of) parameters, returns an array of PHASE_DTYPE with one row per variant.
+# The catapult brings the drone to launch_velocity, from where it climbs steeply on its own power. It then climbs to the
+# mission altitude, flies the cruise leg and the loiter and descends into the catch arm. Times in s, velocities in
+# km/h, altitude in m and rates in m/s.
+def mission_profile(launch_velocity, cruise_velocity, cruise_time, launch_time=5.0, launch_climb_rate=5.0,
+                    climb_altitude=100.0, climb_rate=2.5, loiter_velocity=None, loiter_time=0.0, approach_time=60.0,
+                    approach_rate=-1.5):
+    loiter_velocity = launch_velocity if loiter_velocity is None else loiter_velocity
+    launch_altitude = np.asarray(launch_time) * launch_climb_rate
+    climb_time = np.maximum(np.asarray(climb_altitude) - launch_altitude, 0) / climb_rate
+    columns = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (
+            launch_time, launch_velocity, launch_climb_rate, climb_time, launch_velocity, climb_rate,
+            cruise_time, cruise_velocity, 0.0, loiter_time, loiter_velocity, 0.0,
+            approach_time, launch_velocity, approach_rate)))
+    phases = np.zeros(columns[0].shape + (len(PHASES),), dtype=PHASE_DTYPE)
+    for i, name in enumerate(PHASES):
+        phases[..., i][NAME] = name
+        phases[..., i][DURATION] = columns[3 * i]
+        phases[..., i][VELOCITY] = columns[3 * i + 1]
+        phases[..., i][CLIMB_RATE] = columns[3 * i + 2]
+    return np.atleast_2d(phases)
+
+
+# parameters of a battery pack as used by simulate_mission, values may be arrays (one per variant)
+def battery_pack(capacity, cells, voltage_per_cell, internal_resistance_per_cell, peukert_exponent=1.05,
+                 cutoff_voltage_per_cell=3.0, parallel=1):
+    return dict(capacity=capacity,                                      # in Ah
+                cells=cells,                                            # in series
+                voltage=voltage_per_cell * np.asarray(cells),           # of the full pack, in V
+                resistance=internal_resistance_per_cell * np.asarray(cells) / parallel,     # in Ohm
+                peukert_exponent=peukert_exponent,
+                cutoff_voltage=cutoff_voltage_per_cell * np.asarray(cells))     # in V
+
+
+# linear interpolation in rows of a table (one row per variant) on a common grid, constant beyond its ends
+def _interpolate_rows(grid, table, x):
+    i = np.clip(np.searchsorted(grid, x) - 1, 0, grid.shape[0] - 2)
+    w = np.clip((x - grid[i]) / (grid[i + 1] - grid[i]), 0, 1)
+    return (1 - w) * np.take_along_axis(table, i, axis=1) + w * np.take_along_axis(table, i + 1, axis=1)
+
+
+# Simulate missions of n variants, each given as a row of phases (n x phases array of PHASE_DTYPE or one row for all).
+# Drag is given in level flight on a velocity grid (in km/h), as drags (in N) of shape (n, velocities) or (velocities,).
+# Weight (in N), motor constants (k_phi in Vs, resistance in Ohm, max_current in A) and the values of the battery pack
+# (see battery_pack) are numbers or arrays of length n. The battery is integrated in steps of dt (in s).
+#
+# Returns a dict of arrays over the variants:
+# - soc: state of charge at the end of the mission
+# - phase_soc: state of charge at the end of every phase (n x phases)
+# - energy: energy drawn from the battery (in Wh)
+# - min_voltage, max_current: lowest terminal voltage (in V) and highest battery current (in A)
+# - depletion_time: time (in s) at which the state of charge fell below the reserve or the voltage under load below the
+#   cutoff voltage, inf if the mission was completed. From then on the variant is not integrated anymore, so its state
+#   of charge, energy and phase_soc are those at depletion.
+# - feasible: whether propeller, motor and battery can deliver every operating point
+# - valid: feasible and not depleted
+# With record=True also the time (in s), state of charge and terminal voltage of every step are returned (n x steps).
+def simulate_mission(phases, drag_velocities, drags, weight, prop_map, num_engines, k_phi, resistance, max_current,
+                     battery, dt=1.0, reserve=0.2, record=False):
+    phases = np.atleast_2d(phases)
+    scalars = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=float)) for value in (
+        weight, k_phi, resistance, max_current, battery['capacity'], battery['voltage'], battery['resistance'],
+        battery['peukert_exponent'], battery['cutoff_voltage'], np.ones(phases.shape[0]))))
+    weight, k_phi, resistance, max_current, capacity, full_voltage, pack_resistance, peukert, cutoff, _ = scalars
+    n = weight.shape[0]
+    phases = np.broadcast_to(phases, (n, phases.shape[1]))
+    drag_velocities = np.asarray(drag_velocities, dtype=float)
+    drags = np.broadcast_to(np.asarray(drags, dtype=float), (n, drag_velocities.shape[0]))
+
+    # power drawn by the motors in every phase, all phases of all variants at once
+    velocity, climb_rate = phases[VELOCITY], phases[CLIMB_RATE]
+    thrust = _interpolate_rows(drag_velocities, drags, velocity) \
+        + weight[:, None] * np.clip(climb_rate / np.maximum(velocity / 3.6, 1e-6), -1, 1)
+    powered = thrust > 0
+    rpm, torque, _, prop_valid = prop_map.operating_point(velocity, np.maximum(thrust, 0) / num_engines)
+    speed = rpm / 60
+    motor_current = 2 * np.pi / k_phi[:, None] * torque
+    motor_voltage = speed * k_phi[:, None] + 2 * np.pi * resistance[:, None] / k_phi[:, None] * torque
+    # points outside of the propeller table are infeasible and drawn at zero power
+    power = np.where(powered & prop_valid, np.nan_to_num(num_engines * motor_voltage * motor_current), 0.0)
+    feasible = np.all(~powered | (prop_valid & (motor_current <= max_current[:, None])), axis=1)
+
+    rated_current = capacity / PEUKERT_RATED_TIME
+    charge = np.zeros(n)            # drawn, in Ah (Peukert corrected)
+    energy = np.zeros(n)            # in Wh
+    min_voltage = full_voltage.copy()
+    max_current_drawn = np.zeros(n)
+    depletion_time = np.full(n, np.inf)
+    phase_soc = np.ones(phases.shape)
+    time = np.zeros(n)
+    history = []
+
+    for p in range(phases.shape[1]):
+        duration = phases[DURATION][:, p]
+        steps = int(np.ceil(np.max(duration) / dt)) if np.max(duration) > 0 else 0
+        for step in range(steps):
+            # depleted variants are frozen at the state of their depletion
+            step_time = np.where(np.isinf(depletion_time), np.clip(duration - step * dt, 0, dt), 0)
+            soc = 1 - charge / capacity
+            open_voltage = full_voltage * np.interp(soc, OCV_SOC, OCV)
+
+            # battery current for the power of the phase, with the voltage sag over the internal resistance
+            discriminant = open_voltage ** 2 - 4 * pack_resistance * power[:, p]
+            current = np.where(pack_resistance > 0,
+                               2 * power[:, p] / (open_voltage + np.sqrt(np.maximum(discriminant, 0))),
+                               power[:, p] / open_voltage)
+            voltage = open_voltage - pack_resistance * current
+            feasible &= (step_time == 0) | ((discriminant >= 0) & (~powered[:, p] | (motor_voltage[:, p] <= voltage)))
+
+            # Peukert: currents above the rated current drain more than their charge, lower ones are not rewarded
+            drain = current * np.maximum(current / rated_current, 1) ** (peukert - 1)
+            charge = np.minimum(charge + drain * step_time / 3600, capacity)
+            energy += voltage * current * step_time / 3600
+            min_voltage = np.where(step_time > 0, np.minimum(min_voltage, voltage), min_voltage)
+            max_current_drawn = np.where(step_time > 0, np.maximum(max_current_drawn, current), max_current_drawn)
+            time += step_time
+
+            depleted = ((1 - charge / capacity < reserve) | (voltage < cutoff)) & (step_time > 0)
+            depletion_time = np.where(depleted & np.isinf(depletion_time), time, depletion_time)
+            if record:
+                history.append((time.copy(), 1 - charge / capacity, voltage))
+        phase_soc[:, p] = 1 - charge / capacity
+
+    result = dict(soc=1 - charge / capacity, phase_soc=phase_soc, energy=energy, min_voltage=min_voltage,
+                  max_current=max_current_drawn, depletion_time=depletion_time, feasible=feasible,
+                  valid=feasible & np.isinf(depletion_time))
+    if record:
+        for i, name in enumerate(('time', 'soc_history', 'voltage_history')):
+            result[name] = np.stack([entry[i] for entry in history], axis=1) if history else np.zeros((n, 0))
+    return result
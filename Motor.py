@@ -4,6 +4,8 @@ from parapy.geom import Cylinder
 from parapy.geom.generic.positioning import Position, Point, Orientation
 from parapy.core.validate import IsInstance
 import numpy as np
+from StepExport import point_key
+from MotorSelection import KV, RESISTANCE, LENGTH, DIAMETER, MAX_CURRENT, MAX_VOLTAGE, MASS
 
 class Motor(Base):
     torque_op = Input()
@@ -20,23 +22,23 @@ class Motor(Base):
 
     @Attribute
     def kV(self):
-        return self.motor_data[self.motor_idx, 1]
+        return self.motor_data[KV][self.motor_idx]
 
     @Attribute
     def weight(self):
-        return 9.80665 * self.motor_data[self.motor_idx, 7]/1000
+        return 9.80665 * self.motor_data[MASS][self.motor_idx]/1000
 
     @Attribute
     def max_voltage(self):
-        return self.motor_data[self.motor_idx, 6]
+        return self.motor_data[MAX_VOLTAGE][self.motor_idx]
 
     @Attribute
     def max_current(self):
-        return self.motor_data[self.motor_idx, 5]
+        return self.motor_data[MAX_CURRENT][self.motor_idx]
 
     @Attribute
     def resistance(self):
-        return self.motor_data[self.motor_idx, 2]
+        return self.motor_data[RESISTANCE][self.motor_idx]
 
     @Attribute
     def voltage(self):
@@ -70,17 +72,15 @@ class Motor(Base):
     def is_valid(self):
         return self.current_valid and self.voltage_valid
 
+    # works element-wise on arrays of speeds and torques
     def variable_valid(self, speed, torque):
-        return self.variable_current_valid(torque) and self.variable_voltage_valid(speed, torque)
+        return np.logical_and(self.variable_current_valid(torque), self.variable_voltage_valid(speed, torque))
 
     @Attribute
     def voltages(self):
         characteristics, rpm = self.parent.propeller.prop_characteristics
         torque = characteristics[:, 6, :]
-        voltages = np.zeros_like(torque)
-        for i in range(voltages.shape[1]):
-            voltages[:, i] = rpm[i] / 60 * self.k_phi + 2 * np.pi * self.resistance / self.k_phi * torque[:, i]
-        return voltages
+        return rpm / 60 * self.k_phi + 2 * np.pi * self.resistance / self.k_phi * torque
 
     @Attribute
     def battery_cells_required(self):
@@ -88,11 +88,16 @@ class Motor(Base):
 
     @Attribute
     def diameter(self):
-        return self.motor_data[self.motor_idx, 4]/1000
+        return self.motor_data[DIAMETER][self.motor_idx]/1000
 
     @Attribute
     def length(self):
-        return self.motor_data[self.motor_idx, 3]/1000
+        return self.motor_data[LENGTH][self.motor_idx]/1000
+
+    # values defining the geometry of the motor, key in the STEP cache (StepExport.py)
+    @Attribute
+    def geometry_key(self):
+        return [self.diameter, self.length, point_key(self.cog)]
 
     @Part(parse=False)
     def body(self):
@@ -0,0 +1,106 @@
+import glob
+import os
+import os.path
+
+import numpy as np
+import pandas as pd
+
+# Motor catalog and selection of a motor from it for a required operating point. Current and voltage of every motor in
+# the catalog are computed at once, so the cost does not depend on the size of the catalog.
+#
+# The catalog (Inputs/Motor_data.xlsx) is compiled once into a structured array with named, typed columns and stored
+# as .npy in Inputs/__cache__, keyed on the modification time of the workbook. It is opened memory-mapped, so all
+# Aircraft instances and batch worker processes share the same pages instead of parsing the workbook again.
+
+MOTOR_DATA_FILE = 'Inputs/Motor_data.xlsx'
+CACHE_DIR = os.path.join('Inputs', '__cache__')
+
+# columns of the compiled catalog, in the order of the columns of the workbook
+NAME, KV, RESISTANCE, LENGTH, DIAMETER, MAX_CURRENT, MAX_VOLTAGE, MASS = \
+    'name', 'kV', 'R', 'length', 'diameter', 'Imax', 'Vmax', 'mass'
+MOTOR_DTYPE = np.dtype([(NAME, 'U64'),
+                        (KV, 'f8'),             # in RPM/V
+                        (RESISTANCE, 'f8'),     # in Ohm
+                        (LENGTH, 'f8'),         # in mm
+                        (DIAMETER, 'f8'),       # in mm
+                        (MAX_CURRENT, 'f8'),    # in A
+                        (MAX_VOLTAGE, 'f8'),    # in V
+                        (MASS, 'f8')])          # in g
+
+OBJECTIVES = ('mass', 'margin')
+
+# in-memory catalogs, keyed by file path and holding (mtime, catalog)
+_loaded = {}
+
+
+# motor catalog of a workbook as structured array, sorted by kV
+def compile_motor_data(file_path=MOTOR_DATA_FILE):
+    table = pd.read_excel(file_path)
+    data = np.empty(table.shape[0], dtype=MOTOR_DTYPE)
+    for name, (_, column) in zip(MOTOR_DTYPE.names, table.items()):
+        data[name] = column.astype(str) if name == NAME else column.astype(float)
+    return data[np.argsort(data[KV], kind='stable')]
+
+
+# compiled motor catalog of a workbook, memory-mapped from the cache whenever it is up to date
+def load_motor_data(file_path=MOTOR_DATA_FILE):
+    mtime = os.stat(file_path).st_mtime_ns
+    loaded = _loaded.get(file_path)
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    cache_path = os.path.join(CACHE_DIR, '{}.{}.npy'.format(name, mtime))
+    try:
+        data = np.load(cache_path, mmap_mode='r')
+    except (OSError, ValueError):
+        data = compile_motor_data(file_path)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path + '.{}.tmp.npy'.format(os.getpid())
+            np.save(tmp_path, data)
+            os.replace(tmp_path, cache_path)
+            data = np.load(cache_path, mmap_mode='r')
+        except OSError:
+            data.setflags(write=False)      # cache is optional, keep the compiled catalog in memory
+        for stale_path in glob.glob(os.path.join(CACHE_DIR, name + '.*.npy')):
+            if stale_path != cache_path and not stale_path.endswith('.tmp.npy'):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass                    # still mapped by another process
+
+    _loaded[file_path] = (mtime, data)
+    return data
+
+
+# current (in A) and voltage (in V) of every motor at the motor speed (in 1/s) and torque (in Nm)
+def motor_operating_points(motor_data, speed, torque):
+    k_phi = 60 / motor_data[KV]
+    resistance = motor_data[RESISTANCE]
+    current = 2 * np.pi / k_phi * torque
+    voltage = speed * k_phi + 2 * np.pi * resistance / k_phi * torque
+    return current, voltage
+
+
+# smallest relative reserve of current and voltage of every motor, negative if a limit is exceeded
+def motor_margins(motor_data, speed, torque, supply_voltage):
+    current, voltage = motor_operating_points(motor_data, speed, torque)
+    current_margin = 1 - current / motor_data[MAX_CURRENT]
+    voltage_margin = 1 - voltage / supply_voltage
+    return np.minimum(current_margin, voltage_margin)
+
+
+# index of the best motor for the operating point. With objective 'mass' the lightest feasible motor is chosen, with
+# 'margin' the feasible motor with the largest reserve on current and voltage. If no motor is feasible, the one that
+# exceeds its limits the least is returned.
+def select_motor(motor_data, speed, torque, supply_voltage, objective='mass'):
+    if objective not in OBJECTIVES:
+        raise ValueError("Unknown motor selection objective '{}', use one of {}".format(objective, OBJECTIVES))
+    margin = motor_margins(motor_data, speed, torque, supply_voltage)
+    feasible = margin >= 0
+    if not np.any(feasible):
+        return int(np.argmax(margin))
+    if objective == 'mass':
+        return int(np.argmin(np.where(feasible, motor_data[MASS], np.inf)))
+    return int(np.argmax(np.where(feasible, margin, -np.inf)))
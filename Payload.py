@@ -1,6 +1,7 @@
 from parapy.core import Base, Attribute, Input, Part
 from parapy.geom.generic.positioning import Point, Position, Orientation
 from parapy.geom import Box
+from StepExport import point_key
 
 
 class Payload(Base):
@@ -21,6 +22,11 @@ class Payload(Base):
     def cog(self):
         return Point(self.cog_x, self.cog_y, self.cog_z)
 
+    # values defining the geometry of the payload, key in the STEP cache (StepExport.py)
+    @Attribute
+    def geometry_key(self):
+        return [self.length, self.width, self.height, point_key(self.cog)]
+
     @Part
     def body(self):
         return Box(self.length, self.width, self.height,
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Background rendering of the plots of Aircraft. The plotting actions take a snapshot of the data (plain arrays and
+# numbers, so nothing of the ParaPy model is evaluated in the background) and submit it to PLOT_POOL, which renders it
+# with the Agg backend into its own Figure object. The snapshot itself is evaluated on the calling thread, including any
+# Q3D runs it needs, as ParaPy is not thread safe. No pyplot state is used, so plots of many designs are rendered at the
+# same time and the GUI is not blocked by the rendering. Every submission returns a handle (a concurrent.futures.Future)
+# that can be polled with done() or waited for with result(), which returns the path of the written file or raises the
+# error of the rendering. The number of threads can be set with the environment variable PLOT_WORKERS.
+
+PLOT_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get('PLOT_WORKERS', 4)))
+
+
+# render a plot in the background, returns the handle
+def submit_plot(render, path, *data):
+    handle = PLOT_POOL.submit(_render, render, path, *data)
+    handle.add_done_callback(_report)
+    return handle
+
+
+def _render(render, path, *data):
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    render(figure, *data)
+    figure.savefig(path)
+    return path
+
+
+def _report(handle):
+    if handle.cancelled():
+        return
+    error = handle.exception()
+    if error is None:
+        print("Plot written:", handle.result())
+    else:
+        print("Plot failed:", repr(error))
+
+
+# propeller thrust over velocity for different RPMs, with the design point
+def render_prop_curve(figure, v, t, velocity, drag):
+    ax = figure.add_subplot(111)
+    ax.plot(v, t, 'b')
+    ax.plot(velocity, drag, 'r*')
+    ax.plot([0, velocity, velocity], [drag, drag, 0], 'k:')
+    ax.set_xlabel("Velocity (km/h)")
+    ax.set_ylabel("Thrust (N)")
+    ax.set_title("Thrust over velocity of the drone")
+
+
+# motor characteristic for maximal voltage and propeller torque for different propeller speeds and velocities
+def render_motor_curve(figure, torque, motor_speed, q, rpm, v, torque_op, rpm_op):
+    ax = figure.add_subplot(111)
+    rpm_matrix = np.ones((q.shape[0], 1)) * rpm
+    ax.plot(torque, motor_speed)
+    sc = ax.scatter(q, rpm_matrix / 60, s=2, c=v)
+    ax.plot(torque_op, rpm_op / 60, "r*")
+    ax.plot([0, torque_op, torque_op], [rpm_op / 60, rpm_op / 60, 0], 'k:')
+    figure.colorbar(sc, ax=ax, label="Velocity (km/h)")
+    ax.set_xlabel("Motor Torque (Nm)")
+    ax.set_ylabel("Motor Speed, Propeller Speed (1/s)")
+    ax.set_title("Motor Characteristics for max. Voltage\n and Propeller Torque Requirement")
+
+
+# performance at varying velocities
+def render_velocity_sweep(figure, velocities, motor_speed, drags, current, efficiency):
+    ax1, ax2, ax3, ax4 = figure.subplots(4, 1, sharex=True, sharey=False)
+    ax1.plot(velocities, motor_speed)
+    ax1.set_ylabel("Motor Speed (1/s)")
+
+    ax2.plot(velocities, drags)
+    ax2.set_ylabel("Drag (N)")
+
+    ax3.plot(velocities, current)
+    ax3.set_ylabel("Current (A)")
+
+    ax4.plot(velocities, efficiency)
+    ax4.set_ylabel("Aerodynamic Efficiency (-)")
+    ax4.set_xlabel("Velocity (km/h)")
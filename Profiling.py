@@ -0,0 +1,174 @@
+import inspect
+import json
+import os
+import os.path
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Opt-in profiling of a design run. When enabled, every evaluation of an Attribute or Part of the instrumented classes
+# is timed (call count, total and self time) and every access that is answered from the ParaPy cache is counted as a
+# hit. MATLAB calls of the engine pool are recorded as separate spans. The results are available as a summary table
+# and as timelines in the Chrome trace format (open in chrome://tracing or https://ui.perfetto.dev), one per traced
+# block, e.g. per pass of Aircraft.iterate.
+#
+# Profiling is switched on with PROFILER.enable(trace_dir), e.g. by the --profile option of Batch.py. Evaluations are
+# detected with sys.setprofile, so it slows the run down and is off by default.
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_dir = None
+        self._lock = threading.Lock()
+        self._tracked = {}          # (file name, function name) -> name of the Attribute in the summary
+        self._files = {}            # file names of code objects -> absolute paths
+        self._stack = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}         # name -> {'calls', 'accesses', 'total', 'self'}
+            self.events = []        # complete events of the Chrome trace format
+        self._start = time.perf_counter()
+
+    def _entry(self, name):
+        if name not in self.stats:
+            self.stats[name] = {'calls': 0, 'accesses': 0, 'total': 0.0, 'self': 0.0}
+        return self.stats[name]
+
+    def _timestamp(self, t):
+        return (t - self._start) * 1e6     # in us, as used by the trace format
+
+    # instrument the Attributes and Parts defined in the body of the given classes
+    def instrument(self, *classes):
+        from parapy.core import Attribute, Part
+        for cls in classes:
+            names = {name for name, value in vars(cls).items() if isinstance(value, (Attribute, Part))}
+            file_name = os.path.abspath(inspect.getsourcefile(cls))
+            for name in names:
+                self._tracked[(file_name, name)] = cls.__name__ + '.' + name
+            self._patch_access(cls, names)
+
+    # count all accesses of the instrumented names, the difference to the evaluations are the cache hits
+    def _patch_access(self, cls, names):
+        original = cls.__getattribute__
+        profiler = self
+
+        def __getattribute__(obj, name):
+            if profiler.enabled and name in names:
+                with profiler._lock:
+                    profiler._entry(type(obj).__name__ + '.' + name)['accesses'] += 1
+            return original(obj, name)
+
+        cls.__getattribute__ = __getattribute__
+
+    def _profile(self, frame, event, arg):
+        if event not in ('call', 'return'):
+            return
+        code = frame.f_code
+        file_name = self._files.get(code.co_filename)
+        if file_name is None:
+            file_name = self._files[code.co_filename] = os.path.abspath(code.co_filename)
+        name = self._tracked.get((file_name, code.co_name))
+        if name is None:
+            return
+        stack = self._frames()
+        now = time.perf_counter()
+        if event == 'call':
+            stack.append([frame, name, now, 0.0])
+        elif stack and stack[-1][0] is frame:
+            _, name, start, children = stack.pop()
+            duration = now - start
+            if stack:
+                stack[-1][3] += duration
+            self._record(name, 'attribute', start, duration, self_time=duration - children)
+
+    def _frames(self):
+        if not hasattr(self._stack, 'frames'):
+            self._stack.frames = []
+        return self._stack.frames
+
+    def _record(self, name, category, start, duration, self_time=None, **args):
+        with self._lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['total'] += duration
+            entry['self'] += duration if self_time is None else self_time
+            self.events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(),
+                                'tid': threading.get_ident(), 'ts': self._timestamp(start),
+                                'dur': duration * 1e6, 'args': args})
+
+    def enable(self, trace_dir=None):
+        if self.enabled:
+            return
+        if not self._tracked:
+            self.instrument(*default_classes())
+        self.trace_dir = trace_dir
+        self.enabled = True
+        self.reset()
+        sys.setprofile(self._profile)
+        threading.setprofile(self._profile)
+
+    def disable(self):
+        self.enabled = False
+        sys.setprofile(None)
+        threading.setprofile(None)
+
+    # time a block as a separate span, e.g. a MATLAB call. Spans are recorded from any thread.
+    @contextmanager
+    def span(self, name, category='matlab', **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, category, start, time.perf_counter() - start, **args)
+
+    # write the events recorded during the block to <trace_dir>/<name>.json
+    @contextmanager
+    def trace(self, name):
+        if not self.enabled or self.trace_dir is None:
+            yield
+            return
+        with self._lock:
+            first = len(self.events)
+        yield
+        with self._lock:
+            events = self.events[first:]
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with open(os.path.join(self.trace_dir, name + '.json'), 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    # table of all recorded names, sorted by self time
+    def summary(self):
+        with self._lock:
+            rows = sorted(self.stats.items(), key=lambda item: -item[1]['self'])
+        lines = ['{:<45} {:>7} {:>7} {:>10} {:>10}'.format('name', 'calls', 'hits', 'total (s)', 'self (s)')]
+        for name, entry in rows:
+            hits = max(entry['accesses'] - entry['calls'], 0)
+            lines.append('{:<45} {:>7} {:>7} {:>10.3f} {:>10.3f}'.format(name, entry['calls'], hits, entry['total'],
+                                                                       entry['self']))
+        return '\n'.join(lines)
+
+    def write_summary(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.summary() + '\n')
+
+
+# classes instrumented by default
+def default_classes():
+    from Aircraft import Aircraft
+    from Wing import Semiwing
+    from Engine import Engine
+    from Propeller import Propeller
+    from Motor import Motor
+    from Fuselage import Fuselage
+    return Aircraft, Semiwing, Engine, Propeller, Motor, Fuselage
+
+
+PROFILER = Profiler()
@@ -0,0 +1,95 @@
+import os.path
+import re
+import numpy as np
+
+# Native replacement of importPropFile.m. The APC performance files are fixed width (8 columns of 12 characters),
+# each RPM block starts with a "PROP RPM = ..." line and holds 30 rows of data. Parsed tables are stored as .npz next
+# to the data files, so each file is only parsed once as long as it does not change.
+
+PROP_DATA_DIR = 'Prop_data'
+CACHE_DIR = os.path.join(PROP_DATA_DIR, '__cache__')
+
+START_ROW = 14          # first row read by importPropFile.m (1-based)
+COLUMN_WIDTH = 12
+NUM_COLUMNS = 8
+NUM_ROWS = 30           # rows per RPM block
+
+# conversion of the imperial units of the data files to SI (same factors as importPropFile.m)
+MPH_TO_KMH = 1.60934
+INLBF_TO_NM = 0.112985
+LBF_TO_N = 4.44822
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eEdD][-+]?\d+)?')
+
+# in-memory tables, keyed by file path and holding (mtime, characteristics, rpm)
+_loaded = {}
+
+
+# first number found in a fixed width field, NaN if there is none
+def _parse_field(field):
+    match = _NUMBER.search(field)
+    if match is None:
+        return np.nan
+    return float(match.group().replace('d', 'e').replace('D', 'e'))
+
+
+# parse a propeller file into the (30, 8, nRPM) characteristics array and the RPM vector
+def parse_prop_file(file_path):
+    with open(file_path, 'r') as f:
+        lines = f.read().splitlines()[START_ROW - 1:]
+
+    raw = np.array([[_parse_field(line[i * COLUMN_WIDTH:(i + 1) * COLUMN_WIDTH]) for i in range(NUM_COLUMNS)]
+                    for line in lines])
+    raw = raw[~np.all(np.isnan(raw), axis=1)]   # remove empty lines
+
+    # a line without velocity but with a value in the third column is the "PROP RPM" header of a block
+    header = np.isnan(raw[:, 0]) & ~np.isnan(raw[:, 2])
+    header_idx = np.flatnonzero(header)
+    rpm = raw[header_idx, 2]
+
+    characteristics = np.zeros((NUM_ROWS, NUM_COLUMNS, rpm.shape[0]))
+    block_ends = np.append(header_idx[1:], raw.shape[0])
+    for i, (start, end) in enumerate(zip(header_idx + 1, block_ends)):
+        characteristics[:, :, i] = raw[start:end, :]
+
+    # convert units to SI
+    characteristics[:, 0, :] *= MPH_TO_KMH     # mph to km/h
+    characteristics[:, 6, :] *= INLBF_TO_NM    # in-lbf to Nm
+    characteristics[:, 7, :] *= LBF_TO_N       # lbf to N
+    return characteristics, rpm
+
+
+# load a propeller file (e.g. 'P10x6.dat') from the Prop_data folder, using the compiled cache whenever it is up to date
+def import_prop_file(filename):
+    file_path = os.path.join(PROP_DATA_DIR, filename)
+    mtime = os.stat(file_path).st_mtime_ns
+
+    loaded = _loaded.get(file_path)
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1], loaded[2]
+
+    cache_path = os.path.join(CACHE_DIR, os.path.splitext(filename)[0] + '.npz')
+    characteristics, rpm = None, None
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                if int(cached['mtime']) == mtime:
+                    characteristics, rpm = cached['characteristics'], cached['rpm']
+        except (OSError, ValueError, KeyError):
+            pass    # unreadable cache, parse the file again
+
+    if characteristics is None:
+        characteristics, rpm = parse_prop_file(file_path)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = cache_path + '.tmp.npz'
+            np.savez(tmp_path, characteristics=characteristics, rpm=rpm, mtime=np.int64(mtime))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass    # cache is optional, e.g. for a read-only data folder
+
+    # the tables are shared between all propellers using the same file
+    characteristics.setflags(write=False)
+    rpm.setflags(write=False)
+    _loaded[file_path] = (mtime, characteristics, rpm)
+    return characteristics, rpm
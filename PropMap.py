@@ -0,0 +1,97 @@
+import numpy as np
+
+# Continuous operating map of a propeller, built on the APC tables. Thrust and torque divided by the square of the
+# propeller speed (the dimensional Ct and Cp) are interpolated bilinearly in advance ratio and propeller speed, so thrust
+# and torque are continuous functions of (velocity, RPM) that reproduce every point of the table. For a required thrust
+# the RPM is then solved by a vectorized bisection, which works on whole arrays of (velocity, thrust) queries at once.
+#
+# The advance ratio is computed from the velocity and RPM columns with the diameter of the table, in the same way as for
+# the queries. The grid of advance ratios is the union of those of all RPM blocks, so the interpolation within a block
+# is exactly the piecewise linear one of its points. Every block ends at its own largest advance ratio; near the ends
+# only the corners with values are used, and outside of all blocks thrust and torque are NaN.
+
+NUM_BISECTIONS = 40
+TOLERANCE = 1e-9        # relative, for thrusts at the first and last RPM of the table
+
+
+class PropellerMap:
+    def __init__(self, characteristics, rpm):
+        velocity = characteristics[:, 0, :] / 3.6       # in m/s
+        advance_ratio = characteristics[:, 1, :]
+        torque, thrust = characteristics[:, 6, :], characteristics[:, 7, :]
+        speed = np.asarray(rpm, dtype=float) / 60       # in 1/s
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.diameter = np.nanmedian(np.where(advance_ratio > 0.05, velocity / (advance_ratio * speed), np.nan))
+        advance_ratio = velocity / (speed * self.diameter)
+        valid = ~(np.isnan(advance_ratio) | np.isnan(thrust) | np.isnan(torque))
+
+        # thrust / n^2 and torque / n^2 of every RPM block on the common advance ratio grid, NaN outside of the block
+        self.speeds = speed
+        self.advance_ratios = np.unique(advance_ratio[valid])
+        self.thrust_coefficients = np.full((speed.shape[0], self.advance_ratios.shape[0]), np.nan)
+        self.torque_coefficients = np.full((speed.shape[0], self.advance_ratios.shape[0]), np.nan)
+        for k in range(speed.shape[0]):
+            j, order = advance_ratio[valid[:, k], k], np.argsort(advance_ratio[valid[:, k], k])
+            self.thrust_coefficients[k] = np.interp(self.advance_ratios, j[order],
+                                                    thrust[valid[:, k], k][order] / speed[k] ** 2,
+                                                    left=np.nan, right=np.nan)
+            self.torque_coefficients[k] = np.interp(self.advance_ratios, j[order],
+                                                    torque[valid[:, k], k][order] / speed[k] ** 2,
+                                                    left=np.nan, right=np.nan)
+
+    # bilinear interpolation of a coefficient table. Corners without a value are left out and the weights of the others
+    # renormalised, NaN if no corner has a value.
+    def _interpolate(self, table, speed, advance_ratio):
+        k = np.clip(np.searchsorted(self.speeds, speed) - 1, 0, self.speeds.shape[0] - 2)
+        w_k = np.clip((speed - self.speeds[k]) / (self.speeds[k + 1] - self.speeds[k]), 0, 1)
+
+        grid = self.advance_ratios
+        j = np.clip(np.searchsorted(grid, advance_ratio) - 1, 0, grid.shape[0] - 2)
+        w_j = np.clip((advance_ratio - grid[j]) / (grid[j + 1] - grid[j]), 0, 1)
+
+        value = np.zeros(np.shape(w_j))
+        weight = np.zeros(np.shape(w_j))
+        for corner, corner_weight in ((table[k, j], (1 - w_k) * (1 - w_j)), (table[k, j + 1], (1 - w_k) * w_j),
+                                      (table[k + 1, j], w_k * (1 - w_j)), (table[k + 1, j + 1], w_k * w_j)):
+            known = ~np.isnan(corner)
+            value += np.where(known, corner * corner_weight, 0)
+            weight += np.where(known, corner_weight, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            value = np.where(weight > 0, value / weight, np.nan)
+        outside = (advance_ratio < grid[0]) | (advance_ratio > grid[-1]) | np.isnan(advance_ratio)
+        return np.where(outside, np.nan, value)
+
+    def _advance_ratio(self, speed, velocity):
+        return velocity / (speed * self.diameter)
+
+    # thrust (in N) at propeller speed (in 1/s) and velocity (in m/s), NaN outside of the table
+    def thrust(self, speed, velocity):
+        return speed ** 2 * self._interpolate(self.thrust_coefficients, speed, self._advance_ratio(speed, velocity))
+
+    # torque (in Nm) at propeller speed (in 1/s) and velocity (in m/s), NaN outside of the table
+    def torque(self, speed, velocity):
+        return speed ** 2 * self._interpolate(self.torque_coefficients, speed, self._advance_ratio(speed, velocity))
+
+    # operating points for (arrays of) velocities (in km/h) and required thrusts (in N). Returns RPM, torque (in Nm),
+    # thrust (in N) and a validity flag, which is False if the thrust cannot be delivered within the RPM range of the
+    # table. Invalid points are reported at the closest RPM of the table, their torque and thrust are NaN where that
+    # RPM is outside of the table at the velocity.
+    def operating_point(self, velocity, thrust):
+        velocity, thrust = np.broadcast_arrays(np.asarray(velocity, dtype=float) / 3.6,
+                                               np.asarray(thrust, dtype=float))
+        low = np.full(velocity.shape, self.speeds[0])
+        high = np.full(velocity.shape, self.speeds[-1])
+        # at low RPM the advance ratio may be beyond the table, where the propeller delivers less thrust than any point
+        valid = (velocity >= 0) & ~(self.thrust(low, velocity) > thrust * (1 + TOLERANCE)) \
+            & (thrust <= self.thrust(high, velocity) * (1 + TOLERANCE))
+
+        # thrust increases monotonically with the propeller speed at constant velocity, NaN counts as too little thrust
+        for _ in range(NUM_BISECTIONS):
+            middle = (low + high) / 2
+            above = self.thrust(middle, velocity) >= thrust
+            high = np.where(above, middle, high)
+            low = np.where(above, low, middle)
+
+        speed = high
+        return speed * 60, self.torque(speed, velocity), self.thrust(speed, velocity), valid
@@ -6,10 +6,9 @@ from parapy.core.validate import IsInstance
 import numpy as np
 import os.path
 
-
-
-import matlab.engine
-from __init__ import MATLAB_ENG
+from PropData import import_prop_file
+from PropMap import PropellerMap
+from StepExport import point_key
 from __init__ import generate_warning
 
 class Propeller(Base):
@@ -27,10 +26,7 @@ class Propeller(Base):
     def prop_characteristics(self):
         path = 'P'+self.prop+'.dat'
         if os.path.exists('Prop_data/' + path):
-            characteristics, rpm = MATLAB_ENG.importPropFile(path, nargout=2)
-            characteristics = np.asarray(characteristics)
-            rpm = np.asarray(rpm).flatten()
-            return characteristics, rpm
+            return import_prop_file(path)
         else:
             generate_warning("Propeller not found", "The propeller you chose was not found in the data base.")
             return None
@@ -45,67 +41,54 @@ class Propeller(Base):
         characteristics, _ = self.prop_characteristics
         return np.nanmax(characteristics[:, 0, :])
 
+    # continuous operating map of the propeller (see PropMap.py)
+    @Attribute
+    def prop_map(self):
+        characteristics, rpm = self.prop_characteristics
+        return PropellerMap(characteristics, rpm)
+
     @Attribute
     def op_valid(self):
-        characteristics, _ = self.prop_characteristics
-        if self.velocity_op <= self.max_velocity and self.thrust <= self.max_thrust \
-                and abs(self.thrust_op - self.thrust) < 3:
-            return True
-        else:
-            return False
+        return self.operation_point[3]
 
     def variable_op_valid(self, velocity, thrust):
-        characteristics, _ = self.prop_characteristics
-        if velocity <= self.max_velocity \
-                and self.variable_thrust_op(self.variable_operation_point(velocity, thrust)) <= self.max_thrust\
-                and abs(self.variable_thrust_op(self.variable_operation_point(velocity, thrust)) - self.thrust) < 3:
-            return True
-        else:
-            return False
+        return self.variable_operation_point(velocity, thrust)[3]
 
+    # operating point at the design point as (rpm, torque, thrust, valid)
     @Attribute
     def operation_point(self):
-        characteristics, rpm = self.prop_characteristics
-        diff_velocities = (characteristics[:, 0, :] - self.velocity_op) / self.max_velocity
-        diff_thrust = (characteristics[:, 7, :] - self.thrust) / self.max_thrust
-        difference = np.abs(diff_velocities) + np.abs(diff_thrust)
-        idx = np.unravel_index(np.nanargmin(difference), difference.shape)
-        return idx
+        rpm, torque, thrust, valid = self.prop_map.operating_point(self.velocity_op, self.thrust)
+        return float(rpm), float(torque), float(thrust), bool(valid)
 
+    # operating points for arrays of velocities and thrusts as (rpm, torque, thrust, valid) arrays
     def variable_operation_point(self, velocity, thrust):
-        characteristics, rpm = self.prop_characteristics
-        diff_velocities = (characteristics[:, 0, :] - velocity) / self.max_velocity
-        diff_thrust = (characteristics[:, 7, :] - thrust) / self.max_thrust
-        difference = np.abs(diff_velocities) + np.abs(diff_thrust)
-        idx = np.unravel_index(np.nanargmin(difference), difference.shape)
-        return idx
+        return self.prop_map.operating_point(velocity, thrust)
 
     @Attribute
     def rpm_op(self):
-        _, rpm = self.prop_characteristics
-        return rpm[self.operation_point[1]]
+        return self.operation_point[0]
 
     def variable_rpm_op(self, operation_point):
-        _, rpm = self.prop_characteristics
-        return rpm[operation_point[1]]
+        return operation_point[0]
 
     @Attribute
     def torque_op(self):
-        characteristics, _ = self.prop_characteristics
-        return characteristics[self.operation_point[0], 6, self.operation_point[1]]
+        return self.operation_point[1]
 
     def variable_torque_op(self, operation_point):
-        characteristics, _ = self.prop_characteristics
-        return characteristics[operation_point[0], 6, operation_point[1]]
+        return operation_point[1]
 
     @Attribute
     def thrust_op(self):
-        characteristics, _ = self.prop_characteristics
-        return characteristics[self.operation_point[0], 7, self.operation_point[1]]
+        return self.operation_point[2]
 
     def variable_thrust_op(self, operation_point):
-        characteristics, _ = self.prop_characteristics
-        return characteristics[operation_point[0], 7, operation_point[1]]
+        return operation_point[2]
+
+    # values defining the geometry of the propeller, key in the STEP cache (StepExport.py)
+    @Attribute
+    def geometry_key(self):
+        return [self.prop_diameter, point_key(self.position)]
 
     @Part
     def body(self):
@@ -0,0 +1,16 @@
+function [Res, AC] = run_q3d_batch(wing_planform_geom, wing_incidence_angle, visc_option, root_cst, tip_cst, air_density, velocities, reynolds_numbers, cls)
+
+   % Evaluate run_q3d for several flight conditions of the same wing in a
+   % single call. velocities, reynolds_numbers and cls are vectors of equal
+   % length, the results are returned as cell arrays with one entry per point.
+
+   n   = numel(velocities);
+   Res = cell(1, n);
+   AC  = cell(1, n);
+
+   for i = 1:n
+       [Res{i}, AC{i}] = run_q3d(wing_planform_geom, wing_incidence_angle, visc_option, root_cst, tip_cst, ...
+                                 air_density, velocities(i), reynolds_numbers(i), cls(i));
+   end
+
+end
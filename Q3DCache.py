@@ -0,0 +1,190 @@
+import copy
+import hashlib
+import os
+import os.path
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+# Persistent cache of Q3D results. Every run is stored on disk under a hash of all its inputs (planform, incidence,
+# CST weights and flight condition), so the same analysis is never sent to MATLAB twice, not even across sessions.
+# Entries are evicted least recently used first once the number of entries or the total size exceeds its limit.
+# Results are handed out as copies, so callers can modify them without changing the cache.
+
+CACHE_VERSION = 1       # increase when run_q3d.m or the Q3D solver changes, which invalidates all stored results
+
+
+# convert MATLAB engine output (struct, matlab.double, ...) to plain Python and NumPy, so it can be pickled
+def to_python(value):
+    if isinstance(value, dict):
+        return {key: to_python(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_python(item) for item in value)
+    if type(value).__module__.startswith('matlab'):
+        return np.array(value)
+    return value
+
+
+class Q3DCache:
+    def __init__(self, cache_dir=os.path.join('Q3D', '__cache__'), max_entries=5000, max_bytes=500 * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}                   # results already loaded in this session
+        self._index = None                  # key -> file size, least recently used first
+        self._lock = threading.RLock()      # results of the engine pool are stored from its worker threads
+
+    # hash of the Q3D inputs. Values are compared as float64, so equal designs give equal keys independent of the
+    # container type (list, tuple, ndarray, matlab.double) they are passed in.
+    @staticmethod
+    def key(wing_geometry, incidence, visc_option, root_cst, tip_cst, air_density, velocity, reynolds_number, cl):
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        for value in (wing_geometry, incidence, visc_option, root_cst, tip_cst, air_density, velocity,
+                      reynolds_number, cl):
+            array = np.asarray(value, dtype=np.float64)
+            digest.update(str(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.pkl')
+
+    # LRU order of the stored entries, built from the file access times on first use
+    @property
+    def index(self):
+        if self._index is None:
+            entries = []
+            if os.path.isdir(self.cache_dir):
+                for name in os.listdir(self.cache_dir):
+                    if name.endswith('.pkl'):
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                        entries.append((stat.st_mtime, name[:-4], stat.st_size))
+            self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        return self._index
+
+    def get(self, key):
+        with self._lock:
+            return copy.deepcopy(self._get(key))
+
+    def _get(self, key):
+        result = self._memory.get(key)
+        if result is None:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    result = pickle.load(f)
+                os.utime(path)              # mark as recently used for other sessions as well
+            except (OSError, EOFError, pickle.UnpicklingError):
+                return None
+            self._memory[key] = result
+        if key in self.index:
+            self.index.move_to_end(key, last=True)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            return copy.deepcopy(self._put(key, to_python(result)))
+
+    # count cache hits and misses, lookups run from the worker threads of the engine pool as well
+    def _count(self, hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _put(self, key, result):
+        self._memory[key] = result
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self.index[key] = os.path.getsize(path)
+            self.index.move_to_end(key, last=True)
+        except OSError:
+            pass                            # the result is still cached in memory
+        self._evict()
+        return result
+
+    # remove the least recently used entries until the limits are met
+    def _evict(self):
+        total = sum(self.index.values())
+        while self.index and (len(self.index) > self.max_entries or total > self.max_bytes):
+            key, size = self.index.popitem(last=False)
+            total -= size
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    # cached result of compute() for the given Q3D inputs
+    def lookup(self, compute, *inputs):
+        key = self.key(*inputs)
+        result = self.get(key)
+        if result is not None:
+            self._count(hits=1)
+            return result
+        self._count(misses=1)
+        return self.put(key, compute())
+
+    # asynchronous version of lookup, submit() has to start the computation and return a concurrent.futures.Future
+    def lookup_async(self, submit, *inputs):
+        key = self.key(*inputs)
+        result = self.get(key)
+        future = Future()
+        if result is not None:
+            self._count(hits=1)
+            future.set_result(result)
+            return future
+        self._count(misses=1)
+
+        def store(pending):
+            try:
+                future.set_result(self.put(key, pending.result()))
+            except Exception as error:
+                future.set_exception(error)
+
+        submit().add_done_callback(store)
+        return future
+
+    # cached results for a list of Q3D inputs. compute_batch is called once with the indices of all points that are not
+    # in the cache yet and has to return their results in the same order.
+    def lookup_batch(self, compute_batch, inputs_list):
+        keys = [self.key(*inputs) for inputs in inputs_list]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        self._count(hits=len(keys) - len(missing), misses=len(missing))
+        if missing:
+            for i, result in zip(missing, compute_batch(missing)):
+                results[i] = self.put(keys[i], result)
+        return results
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.index),
+                    'bytes': sum(self.index.values())}
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        for key in list(self.index):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        self.index.clear()
+        self._memory.clear()
+        self.hits, self.misses = 0, 0
+
+
+Q3D_CACHE = Q3DCache()
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import time
+
+# Append-only store of design results in a SQLite database. Every design is one row of the table designs (inputs as
+# JSON, main outputs as columns) and every pass of Aircraft.iterate one row of the table iterations. The database is
+# opened in WAL mode, so many batch worker processes can append concurrently while others read, and queries run in
+# SQLite without loading all results into memory.
+#
+#   store = ResultsStore('Outputs/batch/results.sqlite')
+#   for design in store.query("status = 'converged' AND total_mass < ?", (5,), order_by='total_mass'):
+#       print(design['name'], design['total_mass'], store.history(design['id']))
+
+RESULTS_FILE = 'results.sqlite'
+
+# output columns of the designs table, as (name, SQLite type)
+DESIGN_COLUMNS = (('total_mass', 'REAL'), ('battery_capacity', 'REAL'), ('battery_cells', 'INTEGER'),
+                  ('wing_surface_area', 'REAL'), ('motor', 'TEXT'), ('endurance_margin', 'REAL'),
+                  ('lift_to_drag', 'REAL'), ('iterations', 'INTEGER'), ('runtime', 'REAL'))
+
+# columns of the iterations table, taken from the entries of Aircraft.convergence_history
+ITERATION_COLUMNS = (('total_mass', 'REAL'), ('battery_capacity', 'REAL'), ('wing_surface_area', 'REAL'),
+                     ('cl_required', 'REAL'), ('motor_idx', 'TEXT'), ('residual_wing_surface_area', 'REAL'),
+                     ('residual_cl_required', 'REAL'), ('residual_battery_capacity', 'REAL'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS designs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    created TEXT,
+    status TEXT,
+    inputs TEXT,
+    warnings TEXT,
+    error TEXT,
+    {design_columns}
+);
+CREATE TABLE IF NOT EXISTS iterations (
+    design_id INTEGER REFERENCES designs(id),
+    pass INTEGER,
+    {iteration_columns}
+);
+CREATE INDEX IF NOT EXISTS designs_name ON designs(name);
+CREATE INDEX IF NOT EXISTS designs_status_mass ON designs(status, total_mass);
+CREATE INDEX IF NOT EXISTS iterations_design ON iterations(design_id, pass);
+""".format(design_columns=',\n    '.join(' '.join(column) for column in DESIGN_COLUMNS),
+           iteration_columns=',\n    '.join(' '.join(column) for column in ITERATION_COLUMNS))
+
+
+class ResultsStore:
+    def __init__(self, path, timeout=60):
+        self.path = path
+        # concurrent writers wait up to timeout (in s) for the write lock
+        self._connection = sqlite3.connect(path, timeout=timeout)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    # append a design record (as returned by Batch.run_design) with its iteration history, returns the id of the design
+    def append(self, record, history=()):
+        design_columns = [name for name, _ in DESIGN_COLUMNS]
+        values = [record.get('name'), time.strftime('%Y-%m-%d %H:%M:%S'), record.get('status'),
+                  json.dumps(record.get('inputs', {}), default=str), json.dumps(record.get('warnings', []), default=str),
+                  record.get('error')] + [record.get(name) for name in design_columns]
+        rows = []
+        for i, entry in enumerate(history):
+            residuals = entry.get('residuals', {})
+            rows.append([i, entry.get('total_mass'), entry.get('battery_capacity'), entry.get('wing_surface_area'),
+                         entry.get('cl_required'), json.dumps(entry.get('motor_idx'), default=int),
+                         residuals.get('wing_surface_area'), residuals.get('cl_required'),
+                         residuals.get('battery_capacity')])
+
+        with self._connection:      # one transaction per design
+            cursor = self._connection.execute(
+                'INSERT INTO designs (name, created, status, inputs, warnings, error, {}) VALUES ({})'.format(
+                    ', '.join(design_columns), ', '.join('?' * len(values))), values)
+            design_id = cursor.lastrowid
+            self._connection.executemany(
+                'INSERT INTO iterations (design_id, pass, {}) VALUES ({})'.format(
+                    ', '.join(name for name, _ in ITERATION_COLUMNS), ', '.join('?' * (len(ITERATION_COLUMNS) + 2))),
+                [[design_id] + row for row in rows])
+        return design_id
+
+    # designs matching an SQL condition on the columns of the designs table, read row by row as dicts
+    def query(self, where=None, parameters=(), order_by=None, limit=None):
+        sql = 'SELECT * FROM designs'
+        if where:
+            sql += ' WHERE ' + where
+        if order_by:
+            sql += ' ORDER BY ' + order_by
+        if limit is not None:
+            sql += ' LIMIT {:d}'.format(limit)
+        for row in self._connection.execute(sql, parameters):
+            design = dict(row)
+            design['inputs'] = json.loads(design['inputs'])
+            design['warnings'] = json.loads(design['warnings'])
+            yield design
+
+    # iteration history of a design, one dict per pass
+    def history(self, design_id):
+        rows = self._connection.execute('SELECT * FROM iterations WHERE design_id = ? ORDER BY pass', (design_id,))
+        history = []
+        for row in rows:
+            entry = dict(row)
+            entry['motor_idx'] = json.loads(entry['motor_idx'])
+            history.append(entry)
+        return history
+
+    def count(self, where=None, parameters=()):
+        sql = 'SELECT COUNT(*) FROM designs' + (' WHERE ' + where if where else '')
+        return self._connection.execute(sql, parameters).fetchone()[0]
+
+    def close(self):
+        self._connection.close()
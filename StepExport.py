@@ -0,0 +1,96 @@
+import glob
+import hashlib
+import json
+import os
+import os.path
+import re
+
+from parapy.exchange import STEPWriter
+
+# Incremental STEP export. Every component of the aircraft (fuselage, each lifting surface, motors, propellers,
+# battery and payload) is written to its own STEP file, stored under a hash of the values defining its geometry. These
+# values are computed without building any geometry (see the geometry_key attributes of the parts), so unchanged
+# components are taken from the cache without building or serialising their shapes again. Components that changed are
+# built and written one after the other: ParaPy evaluates lazily and the STEP writer of OCC keeps its settings in
+# process global state, so neither is thread safe.
+#
+# The assembly is merged from the component files as text (see merge_step_files), so it does not build or serialise
+# any shape either. It holds every component as a product of its own, placed as in the aircraft.
+
+STEP_CACHE_VERSION = 1      # increase when the geometry of a part changes without a change of its geometry_key
+
+# string literals (quotes inside are doubled) and entity references of a STEP file
+STEP_TOKEN = re.compile(r"'(?:[^']|'')*'|#(\d+)")
+
+
+# values of a position (origin and axes), so they can be used in a geometry key
+def position_key(position):
+    return [point_key(position.location), point_key(position.Vx), point_key(position.Vz)]
+
+
+def point_key(point):
+    return [float(point.x), float(point.y), float(point.z)]
+
+
+def component_key(name, values):
+    data = json.dumps([STEP_CACHE_VERSION, name, values], default=float, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+class StepCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, name, key):
+        return os.path.join(self.cache_dir, '{}.{}.stp'.format(name, key))
+
+    # STEP files of all components given as (name, node, geometry key values), returns {name: path}. Only the
+    # components not in the cache are built and written.
+    def export(self, components):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        paths = {}
+        for name, node, values in components:
+            path = self.path(name, component_key(name, values))
+            paths[name] = path
+            if not os.path.exists(path):
+                print("Export STEP of", name)
+                STEPWriter(nodes=[node], filename=path + '.tmp.stp').write()
+                os.replace(path + '.tmp.stp', path)
+        self._remove_stale(paths)
+        return paths
+
+    # older versions of the components
+    def _remove_stale(self, paths):
+        for name, path in paths.items():
+            for stale_path in glob.glob(os.path.join(self.cache_dir, name + '.*.stp')):
+                if stale_path != path and not stale_path.endswith('.tmp.stp'):
+                    os.remove(stale_path)
+
+
+# Merge STEP files into one file with the header of the first file and the entities of all files. The entity numbers
+# of every file are shifted past those of the files before it, references in string literals are left alone.
+def merge_step_files(paths, filename):
+    data = []
+    offset = 0
+    header = None
+    for path in paths:
+        with open(path) as f:
+            text = f.read()
+        start = re.search(r'^DATA;', text, re.MULTILINE).end()
+        end = text.rindex('ENDSEC;')
+        if header is None:
+            header = text[:start]
+        numbers = [0]
+
+        def shift(match):
+            if match.group(1) is None:
+                return match.group(0)
+            numbers.append(int(match.group(1)))
+            return '#{}'.format(int(match.group(1)) + offset)
+
+        data.append(STEP_TOKEN.sub(shift, text[start:end]).strip('\n'))
+        offset += max(numbers)
+
+    with open(filename + '.tmp', 'w') as f:
+        f.write(header + '\n' + '\n'.join(data) + '\nENDSEC;\nEND-ISO-10303-21;\n')
+    os.replace(filename + '.tmp', filename)
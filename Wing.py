@@ -3,16 +3,24 @@
 from parapy.geom import *
 from parapy.core import *
 from Airfoil import *
+from CST import fit_cst
 from math import *
 import matlab.engine
-from _init_ import MATLAB_Q3D_ENGINE
+from _init_ import Q3D_POOL
+from Q3DCache import Q3D_CACHE
+from DragPolar import cached_drag_polar
+from StepExport import position_key
+from __init__ import mesh_deflection, generate_warning
 from kbeutils import *
 from typing import Dict
+import numpy as np
 from matlab import *
 
 # initialise MATLAB engine
 #MATLAB_Q3D_ENGINE = matlab.engine.start_matlab()
 
+SURROGATE_TOLERANCE = 0.05      # largest relative error of a drag polar at its check points without a warning
+
 
 class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
     airfoil_root    = Input("whitcomb.dat")      #: :type: string
@@ -35,7 +43,16 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
 
     visc_option         = Input(1)               #0 for inviscid, 1 for viscous
 
+    drag_surrogate      = Input(False)           # take drag coefficients from a polar fitted to Q3D samples
+    surrogate_cl_range  = Input((0.0, 1.0))      # lift coefficients covered by the polar [-]
+    surrogate_velocity_range = Input((30, 200))  # velocities covered by the polar in [km/h]
+    surrogate_area_step = Input(0.05)            # relative step of the wing areas the polar is fitted for [-]
+
+
 
+    @Input          # tessellation of the displayed wing, by default based on its size (see __init__.py)
+    def mesh_deflection(self):
+        return mesh_deflection(self.w_semi_span)
 
    # @Attribute
    # def taper_ratio(self):
@@ -63,21 +80,21 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
         return [self.root_airfoil, self.tip_airfoil]
 
     @Attribute
-    def root_cst(self):     # Get root CST values from the included MATLAB script
+    def root_cst(self):     # Get root CST values, same fit as the included MATLAB script demo.m
         root_data = self.root_airfoil.yt_xl_xu
-        return MATLAB_Q3D_ENGINE.demo(matlab.double(root_data), nargout=1)
+        return fit_cst(root_data).tolist()
 
     @Attribute
-    def tip_cst(self):       # get tip CST values from the included MATLAB script
+    def tip_cst(self):       # get tip CST values, same fit as the included MATLAB script demo.m
         tip_data = self.tip_airfoil.yt_xl_xu
-        return MATLAB_Q3D_ENGINE.demo(matlab.double(tip_data), nargout=1)
+        return fit_cst(tip_data).tolist()
 
     @Part
     def root_airfoil(self):  # root airfoil will receive self.position as default
         return Airfoil(airfoil_name=self.airfoil_root,
                        chord=self.w_c_root,
                        thickness_factor=self.t_factor_root,
-                       mesh_deflection=0.0001)
+                       mesh_deflection=self.mesh_deflection)
 
     @Part
     def tip_airfoil(self):      # tip airfoil adjusted for sweep and twist angle
@@ -88,7 +105,7 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
                            rotate(self.position, "y", radians(self.twist)),  # apply twist angle
                            "y", self.w_semi_span,
                            "x", self.w_semi_span * tan(radians(-self.sweep))),  # apply sweep
-                       mesh_deflection=0.0001)
+                       mesh_deflection=self.mesh_deflection)
 
     @Part
     def lofted_surf(self):          # define surface for the wing
@@ -99,6 +116,13 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
     def lofted_solid(self):          # define volume for the wing
         return LoftedSolid(profiles=self.profiles,
                            hidden=not (__name__ == '__main__'))
+    def planform(self, area):       # Q3D planform matrix and mean aerodynamic chord of this wing for another area
+        c_root = 2*area/((1+self.taper_ratio)*self.w_semi_span)
+        c_tip = self.taper_ratio*c_root
+        mac = (2/3)*c_root*(1+self.taper_ratio+self.taper_ratio**2)/(1+self.taper_ratio)
+        return [[0, 0, 0, c_root, self.twist],
+                [self.w_semi_span*tan(radians(self.sweep)), self.w_semi_span, 0, c_tip, self.twist]], mac
+
     @Attribute
     def reynolds_number(self):      # calculate Reynolds number for the Q3D solver
         return[self.air_density*self.velocity*self.mean_aerodynamic_chord/self.dynamic_viscosity]
@@ -109,67 +133,101 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
 
 
     @Attribute
-    def run_q3d(self):
-        print("Run Q3D")
-        """Run Q3D (MATLAB) and get back all results and input"""
-        visc_option = self.visc_option
-        air_density = self.air_density
-        velocity = self.velocity
-        cl = self.cl
-        reynolds_number = self.air_density*velocity/3.6*self.mean_aerodynamic_chord/self.dynamic_viscosity
-        incidence       = self.incidence
-
-
+    def wetted_area(self):          # analytic area of the lofted solid: mean contour length times span plus end faces
+        return (0.5*(self.root_airfoil.perimeter+self.tip_airfoil.perimeter)*self.w_semi_span
+                + self.root_airfoil.section_area + self.tip_airfoil.section_area)
 
+    @Attribute
+    def geometry_key(self):         # values defining the geometry of the wing, key in the STEP cache (StepExport.py)
+        return [self.airfoil_root, self.airfoil_tip, self.t_factor_root, self.t_factor_tip, self.w_c_root,
+                self.w_c_tip, self.w_semi_span, self.sweep, self.twist, position_key(self.position)]
 
-        wing_geometry = matlab.double([[0, 0, 0, self.w_c_root, self.twist],
-                           [self.w_semi_span*tan(radians(self.sweep)), self.w_semi_span, 0, self.w_c_tip, self.twist]
-                           ])
-        incidence = matlab.double([incidence])
+    @Attribute
+    def wing_geometry(self):        # planform matrix for Q3D: x, y, z, chord and twist of root and tip
+        return [[0, 0, 0, self.w_c_root, self.twist],
+                [self.w_semi_span*tan(radians(self.sweep)), self.w_semi_span, 0, self.w_c_tip, self.twist]]
 
-        #print(wing_geometry, incidence)
+    @Attribute
+    def run_q3d(self):
+        """Run Q3D (MATLAB) and get back all results and input"""
+        return self.q3d_future.result()
 
-        return MATLAB_Q3D_ENGINE.run_q3d(
-            wing_geometry,
-            matlab.double([incidence]),
-            matlab.double([visc_option]),
-            matlab.double(self.root_cst),
-            matlab.double(self.tip_cst),
-            matlab.double([air_density]),
-            matlab.double([velocity/3.6]),
-            matlab.double([reynolds_number]),
-            matlab.double([cl]),
-            nargout=2
-        )
+    @Attribute
+    def q3d_future(self):
+        """Future of run_q3d, requesting it for several surfaces first lets the engine pool run them concurrently"""
+        return self.variable_q3d_future(self.velocity, self.cl)
+
+    def q3d_reynolds_number(self, velocity, chord=None):
+        """Reynolds number of the mean aerodynamic chord (or the given chord) for the given velocity (in km/h)"""
+        chord = self.mean_aerodynamic_chord if chord is None else chord
+        return self.air_density*velocity/3.6*chord/self.dynamic_viscosity
+
+    def q3d_inputs(self, velocity, cl, geometry=None, chord=None):
+        """Inputs of run_q3d.m for the given velocity (in km/h) and lift coefficient, by default for the planform of
+        this wing"""
+        reynolds_number = self.q3d_reynolds_number(velocity, chord)
+        return (self.wing_geometry if geometry is None else geometry, self.incidence, self.visc_option, self.root_cst, self.tip_cst,
+                self.air_density, velocity/3.6, reynolds_number, cl)
+
+    def variable_q3d_future(self, velocity, cl):
+        """Submit a Q3D run to the engine pool, results of earlier runs are taken from Q3D_CACHE"""
+        inputs = self.q3d_inputs(velocity, cl)
+
+        def submit():
+            print("Run Q3D")
+            return Q3D_POOL.submit(
+                'run_q3d',
+                matlab.double(inputs[0]),
+                matlab.double([inputs[1]]),
+                matlab.double([inputs[2]]),
+                matlab.double(inputs[3]),
+                matlab.double(inputs[4]),
+                matlab.double([inputs[5]]),
+                matlab.double([inputs[6]]),
+                matlab.double([inputs[7]]),
+                matlab.double([inputs[8]]),
+                nargout=2
+            )
+
+        return Q3D_CACHE.lookup_async(submit, *inputs)
 
     def variable_run_q3d(self, velocity, cl):
-        print("Run Q3D")
         """Run Q3D (MATLAB) and get back all results and input"""
-        visc_option = self.visc_option
-        air_density = self.air_density
-        reynolds_number = self.air_density*velocity/3.6*self.mean_aerodynamic_chord/self.dynamic_viscosity
-        incidence       = self.incidence
-
-
-
-
-        wing_geometry = matlab.double([[0, 0, 0, self.w_c_root, self.twist],
-                           [self.w_semi_span*tan(radians(self.sweep)), self.w_semi_span, 0, self.w_c_tip, self.twist]
-                           ])
-        incidence = matlab.double([incidence])
-
-        return MATLAB_Q3D_ENGINE.run_q3d(
-            wing_geometry,
-            matlab.double([incidence]),
-            matlab.double([visc_option]),
-            matlab.double(self.root_cst),
-            matlab.double(self.tip_cst),
-            matlab.double([air_density]),
-            matlab.double([velocity/3.6]),
-            matlab.double([reynolds_number]),
-            matlab.double([cl]),
-            nargout=2
-        )
+        return self.variable_q3d_future(velocity, cl).result()
+
+    def batch_run_q3d(self, velocities, cls, geometry=None, chord=None):
+        """Run Q3D for arrays of velocities (in km/h) and lift coefficients. All points not in Q3D_CACHE yet are split
+        over the engines of the pool, each evaluating its share in a single MATLAB call (run_q3d_batch.m).
+        Returns a list of (Res, AC)"""
+        velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+        cls = np.broadcast_to(np.asarray(cls, dtype=float), velocities.shape)
+        inputs_list = [self.q3d_inputs(velocity, cl, geometry, chord) for velocity, cl in zip(velocities, cls)]
+
+        def compute_batch(indices):
+            print("Run Q3D batch of", len(indices), "points")
+            inputs = inputs_list[indices[0]]
+            futures = []
+            for chunk in np.array_split(np.array(indices), min(Q3D_POOL.size, len(indices))):
+                futures.append(Q3D_POOL.submit(
+                    'run_q3d_batch',
+                    matlab.double(inputs[0]),
+                    matlab.double([inputs[1]]),
+                    matlab.double([inputs[2]]),
+                    matlab.double(inputs[3]),
+                    matlab.double(inputs[4]),
+                    matlab.double([inputs[5]]),
+                    matlab.double([inputs_list[i][6] for i in chunk]),
+                    matlab.double([inputs_list[i][7] for i in chunk]),
+                    matlab.double([inputs_list[i][8] for i in chunk]),
+                    nargout=2
+                ))
+            results = []
+            for future in futures:
+                res, ac = future.result()
+                results.extend(zip(res, ac))
+            return results
+
+        return Q3D_CACHE.lookup_batch(compute_batch, inputs_list)
 
     @Attribute
     def q3d_res(self) -> Dict:
@@ -188,11 +246,57 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
     def wing_cl(self) -> float:
         return self.q3d_res["CLwing"]
 
+    @Attribute
+    def surrogate_area(self):
+        """Wing area rounded to steps of surrogate_area_step, the drag polar is fitted for the planform of this area"""
+        step = log(1 + self.surrogate_area_step)
+        return exp(round(log(self.wing_surface_area)/step)*step)
+
+    @Attribute
+    def drag_polar(self):
+        """Surrogate drag polar CD(CL, Re) of this planform, fitted to one batch of Q3D runs. The polar is fitted for
+        the rounded surrogate_area, so the sizing iterations reuse it as long as the wing area changes less than a
+        step"""
+        geometry, chord = self.planform(self.surrogate_area)
+
+        def evaluate(cls, reynolds_numbers):
+            velocities = reynolds_numbers*3.6*self.dynamic_viscosity/(self.air_density*chord)
+            return np.array([res["CDwing"] for res, _ in self.batch_run_q3d(velocities, cls, geometry, chord)],
+                            dtype=float)
+
+        reynolds_range = [self.q3d_reynolds_number(velocity, chord) for velocity in self.surrogate_velocity_range]
+        key = [geometry, self.incidence, self.visc_option, self.root_cst, self.tip_cst, self.air_density,
+               self.dynamic_viscosity]
+        polar, fitted = cached_drag_polar(key, evaluate, self.surrogate_cl_range, reynolds_range)
+        if fitted and polar.errors.get('max_rel_error', 0) > SURROGATE_TOLERANCE:
+            msg = "The drag polar deviates from Q3D by up to {:.1%} at its check points.".format(
+                polar.errors['max_rel_error'])
+            generate_warning("Inaccurate drag polar", msg)
+        return polar
+
     def variable_wing_cd(self, velocity, cl) -> float:
-        return self.variable_q3d_res(velocity, cl)["CDwing"]
+        return float(self.batch_wing_cd([velocity], [cl])[0])
+
+    def batch_wing_cd(self, velocities, cls, surrogate=True) -> np.ndarray:
+        """Drag coefficients for arrays of velocities (in km/h) and lift coefficients. With drag_surrogate the points
+        covered by the drag polar are taken from it, only the others are run in Q3D"""
+        velocities, cls = np.broadcast_arrays(np.atleast_1d(np.asarray(velocities, dtype=float)),
+                                              np.atleast_1d(np.asarray(cls, dtype=float)))
+        inside = np.zeros(velocities.shape, dtype=bool)
+        cds = np.empty(velocities.shape)
+        if surrogate and self.drag_surrogate:
+            reynolds_numbers = self.q3d_reynolds_number(velocities)
+            inside = self.drag_polar.inside(cls, reynolds_numbers)
+            if np.any(inside):
+                cds[inside] = self.drag_polar(cls[inside], reynolds_numbers[inside])
+        if not np.all(inside):
+            cds[~inside] = [res["CDwing"] for res, _ in self.batch_run_q3d(velocities[~inside], cls[~inside])]
+        return cds
 
     @Attribute
     def wing_cd(self) -> float:
+        if self.drag_surrogate:
+            return self.variable_wing_cd(self.velocity, self.cl)
         return self.q3d_res["CDwing"]
 
     def wing_alfa(self, velocity) -> float:
@@ -203,8 +307,6 @@ class Semiwing(LoftedSolid):  # note use of loftedSolid as superclass
 
 if __name__ == '__main__':
     from parapy.gui import display
-    obj = Semiwing(label="Wing",
-                            mesh_deflection=0.0001
-                            )
+    obj = Semiwing(label="Wing")
     display(obj)
 
@@ -1,10 +1,117 @@
-import matlab.engine
-MATLAB_ENG = matlab.engine.start_matlab()
+import os.path
+import threading
+
+# Single MATLAB engine shared by the whole app. It is only started when a MATLAB-backed attribute is evaluated for the
+# first time. If a shared MATLAB session is running (started in MATLAB with matlab.engine.shareEngine), the app
+# attaches to it instead of starting a new one, so repeated runs and worker processes reuse a warm engine. The name
+# of the session to attach to can be set with the environment variable MATLAB_SESSION.
+
+Q3D_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'Q3D'))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+# start a new engine, or connect to a running shared session if shared is True and one is available
+def start_matlab_engine(shared=True):
+    import matlab.engine
+    engine = None
+    if shared:
+        name = os.environ.get('MATLAB_SESSION')
+        sessions = matlab.engine.find_matlab()
+        if name is not None and name in sessions:
+            engine = matlab.engine.connect_matlab(name)
+        elif name is None and sessions:
+            engine = matlab.engine.connect_matlab(sessions[0])
+    if engine is None:
+        engine = matlab.engine.start_matlab()
+    engine.cd(Q3D_DIR)
+    return engine
+
+
+# the shared engine of the app, started (or connected) on first use
+def get_matlab_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = start_matlab_engine()
+        return _engine
+
+
+# shut down (or disconnect from) an engine, if it is the shared one the next get_matlab_engine starts a new one
+def stop_matlab_engine(engine):
+    global _engine
+    with _engine_lock:
+        if engine is _engine:
+            _engine = None
+    try:
+        engine.quit()
+    except Exception:
+        pass                    # the engine is already gone
+
+
+# MATLAB_ENG is kept as a name for the shared engine, but only started when it is accessed
+def __getattr__(name):
+    if name == 'MATLAB_ENG':
+        return get_matlab_engine()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# Warnings are shown in a message box. When running headless (environment variable KBE_HEADLESS=1 or set_headless),
+# they are printed and collected in WARNINGS instead, so nothing waits for user interaction.
+HEADLESS = os.environ.get('KBE_HEADLESS', '0') == '1'
+WARNINGS = []
+
+
+def set_headless(headless=True):
+    global HEADLESS
+    HEADLESS = headless
+
 
 def generate_warning(warning_header, msg):
+    if HEADLESS:
+        print("WARNING:", warning_header, "-", msg)
+        WARNINGS.append({'header': warning_header, 'message': msg})
+        return
     from tkinter import Tk, mainloop, X, messagebox
     # initialization
     window = Tk()
     window.withdraw()
     # generates message box
-    messagebox.showwarning(warning_header, msg)
\ No newline at end of file
+    messagebox.showwarning(warning_header, msg)
+
+
+# Level of detail of the tessellation used for display: 'coarse' while iterating or browsing, 'fine' for final
+# screenshots and 'auto' to scale the mesh deflection with the size of the model in view, which gives a coarse mesh for
+# the whole aircraft and a finer one when a single part is displayed. The default can be set with the environment
+# variable KBE_LOD or set_lod and is used by all parts created afterwards; the lod input of Aircraft changes it for one
+# aircraft.
+LODS = ('coarse', 'fine', 'auto')
+LOD = os.environ.get('KBE_LOD', 'auto')
+
+FINE_DEFLECTION = 1e-4          # in m
+COARSE_DEFLECTION = 5e-3        # in m
+AUTO_DEFLECTION = 1e-3          # fraction of the model size
+
+
+def set_lod(lod):
+    global LOD
+    if lod not in LODS:
+        raise ValueError("Unknown level of detail '{}', use one of {}".format(lod, LODS))
+    LOD = lod
+
+
+def get_lod():
+    return LOD
+
+
+# mesh deflection (in m) for a model of the given size (in m)
+def mesh_deflection(size, lod=None):
+    lod = LOD if lod is None else lod
+    if lod not in LODS:
+        raise ValueError("Unknown level of detail '{}', use one of {}".format(lod, LODS))
+    if lod == 'fine':
+        return FINE_DEFLECTION
+    if lod == 'coarse':
+        return COARSE_DEFLECTION
+    return min(max(AUTO_DEFLECTION * size, FINE_DEFLECTION), COARSE_DEFLECTION)
@@ -1,5 +1,23 @@
-import matlab.engine
+import os
+from __init__ import get_matlab_engine, start_matlab_engine, stop_matlab_engine
+from EnginePool import MatlabEnginePool
 
-# initialise MATLAB engine
-MATLAB_Q3D_ENGINE = matlab.engine.start_matlab()
-MATLAB_Q3D_ENGINE.cd(r'Q3D')
\ No newline at end of file
+
+# the Q3D engine is the shared, lazily started engine of __init__.py
+def __getattr__(name):
+    if name == 'MATLAB_Q3D_ENGINE':
+        return get_matlab_engine()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# the first engine of the pool is the shared one, started lazily on the first Q3D run. Further engines are only started
+# if calls are submitted concurrently. The size can be set with the environment variable Q3D_ENGINES (default: one
+# engine per lifting surface).
+def _start_q3d_engine(slot):
+    return get_matlab_engine() if slot == 0 else start_matlab_engine(shared=False)
+
+
+Q3D_POOL = MatlabEnginePool(size=int(os.environ.get('Q3D_ENGINES', 3)),
+                            start_engine=_start_q3d_engine,
+                            stop_engine=stop_matlab_engine,
+                            timeout=float(os.environ.get('Q3D_TIMEOUT', 600)))